@@ -1,100 +1,1122 @@
 # CLI.py
+import asyncio
+import os
 import socket
+import sys
 import threading
-import configparser
-from registry import TOOL_REGISTRY
-from auto_config import CONFIG_PATH
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from registry import TOOL_REGISTRY, call_runner
+from settings import get_settings
+from history import get_history, history_id, parse_history, format_rows
+from metrics import METRICS, count, gauge, observe
+from workers import CANCEL_GRACE, WorkerPool, job_deadline
+from trace32.targets import Target, load_targets
+from stats import format_durations
+from timeouts import get_profiles
+from suite import load_manifest, parse_suite, run_suite, write_reports
 
-cfg = configparser.ConfigParser()
-cfg.read(CONFIG_PATH)
+MAX_RUNNER_THREADS = 64     # executor cap; [runtime] workers limits actual runs
 
-HOST = cfg.get("runtime", "cli_host", fallback="127.0.0.1")
-PORT = cfg.getint("runtime", "cli_port", fallback=12345)
+EOT           = "<<<EOT>>>"
+PROTO_VERSION = 2
+LEGACY_FLUSH  = 0.05        # unterminated command taken as complete after this idle time
+MAX_LINE      = 64 * 1024
+MAX_TRANSFER  = 64 * 1024 * 1024    # bytes per READMEM/WRITEMEM
+PAYLOAD_CHUNK = 256 * 1024
+LOCAL_SNDBUF  = 4 * 1024 * 1024     # send buffer of local (AF_UNIX) connections, capped by net.core.wmem_max
+ACCESS        = {"D": 0x0000, "P": 0x0001}   # TRACE32 access classes, e.g. P:0x08000000
+COMMANDS      = ("RUN", "REPEAT", "RUNSUITE", "CANCEL", "HISTORY", "STATS", "PING", "PROTO", "READMEM",
+                 "WRITEMEM")
 
-def handle_client(conn, addr):
-    print(f"[PYTHON] Client connected: {addr}")
+
+def detect_tool(path):
+    # Dynamic tool detection based on path
+    path_lower = path.lower()
+    if path_lower.endswith(".cmm"):
+        return "CMM"
+    elif path_lower.endswith((".vf", ".vflash", ".vflashpack")):
+        return "VFLASH"
+    elif path_lower.endswith((".hex", ".ihex", ".s19", ".s28", ".s37", ".srec", ".mot")):
+        return "HEX_TOOL"
+    elif "flash" in path_lower:
+        return "CFLASH"
+    elif "vn89" in path_lower or "vnxx" in path_lower:
+        return "VN89XX"
+    return "DEFAULT_TOOL"
+
+
+def parse_request(msg):
+    """
+    Parse 'RUN|PATH|INDEX[|TARGET]' into (tool, path, count_index, target).
+    TARGET is a target name or capability tag; empty means any target.
+    Raises ValueError with the error reply for the client.
+    """
+    parts = msg.split("|")
+    if len(parts) < 2:
+        raise ValueError("ERROR: Invalid command")
+
+    command = parts[0].upper()
+    path = parts[1]
+    count_index = 1
+    if len(parts) >= 3:
+        try:
+            count_index = int(parts[2])
+        except Exception:
+            raise ValueError("ERROR: Invalid count/index")
+    target = parts[3].strip() if len(parts) >= 4 else ""
+
+    if command != "RUN":
+        raise ValueError("ERROR: Unsupported command")
+
+    tool = detect_tool(path)
+    if tool not in TOOL_REGISTRY:
+        raise ValueError("ERROR: Unknown or unsupported tool")
+    return tool, path, count_index, target
+
+
+def execute_job(tool, path, count_index, on_message=None, target=None, pool=None, timeout=None,
+                cancel=None):
+    # Runs on an executor thread; never on the event loop. With a WorkerPool
+    # the runner itself runs in the target's worker process. `timeout`
+    # replaces [runtime] timeout for runners that take one (CMM scripts);
+    # without it they get the script's adaptive timeout (timeouts.py), which
+    # the result reports. `cancel` is the job's threading.Event, set by
+    # CANCEL or a disconnect.
+    started, start = time.time(), time.monotonic()
+    s = get_settings()
+    history = get_history(s.history_db)
+    timed = TOOL_REGISTRY[tool].get("timed")
+    if timed:
+        profiles = get_profiles(history)
+        timeout, how = (timeout, "requested") if timeout else profiles.timeout_for(path, s)
     try:
-        with conn:
-            while True:
-                data = conn.recv(1024)
-                if not data:
-                    print(f"[PYTHON] Client {addr} disconnected.")
-                    break
-
-                msg = data.decode(errors="ignore").strip()
-                print(f"[PYTHON] Received: {msg!r}")
-
-                if msg == "PING":
-                    conn.sendall(b"PONG")
-                    continue
-
-                # Expected format: RUN|PATH|INDEX
-                parts = msg.split("|")
-                if len(parts) < 2:
-                    conn.sendall(b"ERROR: Invalid command\n")
-                    continue
-
-                command = parts[0].upper()
-                path = parts[1]
-                count_index = 1
-                if len(parts) >= 3:
-                    try:
-                        count_index = int(parts[2])
-                    except Exception:
-                        conn.sendall(b"ERROR: Invalid count/index\n")
-                        continue
-
-                if command != "RUN":
-                    conn.sendall(b"ERROR: Unsupported command\n")
-                    continue
-
-                # Dynamic tool detection based on path
-                tool = None
-                path_lower = path.lower()
-                if path_lower.endswith(".cmm"):
-                    tool = "CMM"
-                elif "flash" in path_lower:
-                    tool = "CFLASH"
-                elif path_lower.endswith(".hex"):
-                    tool = "HEX_TOOL"
-                elif "vn89" in path_lower or "vnxx" in path_lower:
-                    tool = "VN89XX"
-                else:
-                    tool = "DEFAULT_TOOL"
-
-                if tool not in TOOL_REGISTRY:
-                    conn.sendall(b"ERROR: Unknown or unsupported tool\n")
-                    continue
-
-                # Run single execution per request
-                try:
-                    runner = TOOL_REGISTRY[tool]["runner"]
-                    print(f"[PYTHON] Running {tool} on {path} (index={count_index})")
-                    result = runner(path)  # "PASS: ..." or "FAIL: ..."
-                    payload = f"[{count_index}] {result.rstrip()}\n\n<<EOT>>\n"
-                    conn.sendall(payload.encode(errors="ignore"))
-                    print(f"[PYTHON] Sent result for index {count_index}, size={len(payload)}")
-                except Exception as e:
-                    err = f"FAIL|{str(e)}\n<<EOT>>\n"
-                    conn.sendall(err.encode())
-                    print(f"[PYTHON] Error running tool {tool}: {e}")
+        print(f"[PYTHON] Running {tool} on {path} (index={count_index}, target={target and target.name})")
+        if pool is not None:
+            result = pool.run(target, tool, path, on_message, job_deadline(s, timeout, tool, path), timeout,
+                              cancel)
+        else:
+            result = call_runner(tool, path, on_message, target, timeout, cancel)
+        print(f"[PYTHON] Result ready for index {count_index}, size={len(result)}")
+        if not result.startswith("PASS"):
+            count("t32_errors_total", tool=tool, kind="fail")
+    except Exception as e:
+        result = f"FAIL: {e}"
+        print(f"[PYTHON] Error running tool {tool}: {e}")
+        count("t32_errors_total", tool=tool, kind="exception")
+    seconds = time.monotonic() - start
+    observe("t32_run_seconds", seconds, tool=tool)
+    if timed:
+        if result.startswith("PASS"):
+            profiles.record(path, seconds, s)
+        result += f"\nTimeout: {timeout or s.timeout:.1f}s ({how})"
+    if history:
+        history.record(started, seconds, path, tool, count_index, target and target.name, result)
+    return result
+
+
+def parse_stats(msg):
+    """
+    Parse 'STATS[|PREFIX][|ID]' into (prefix, req_id). A single field is the
+    prefix, of two the last one is the ID; 'prefix=...' names it explicitly,
+    e.g. STATS|prefix=t32_phase|7 or STATS|prefix=|7 for all metrics.
+    """
+    prefix, bare = None, []
+    for field in msg.split("|")[1:]:
+        key, sep, value = field.partition("=")
+        if not sep:
+            bare.append(field.strip())
+        elif key.strip().lower() == "prefix":
+            prefix = value.strip()
+        else:
+            raise ValueError(f"ERROR: Unknown STATS field '{key.strip()}'")
+    if prefix is None:
+        prefix = bare.pop(0) if bare else ""
+    return prefix, bare[-1] if bare and bare[-1] else "0"
+
+
+def parse_repeat(msg):
+    """
+    Parse 'REPEAT|PATH|COUNT[|ID[|TARGET[|STOP]]]' into
+    (tool, path, count, req_id, target, stop_on_fail).
+    """
+    parts = msg.split("|") + [""] * 3
+    try:
+        count = int(parts[2])
+    except ValueError:
+        raise ValueError("ERROR: Invalid count")
+    if count < 1:
+        raise ValueError("ERROR: Invalid count")
+    req_id = parts[3].strip() or "1"        # any string, like the IDs of the other commands
+    tool, path, _, target = parse_request(f"RUN|{parts[1]}|1|{parts[4]}")
+    stop_on_fail = parts[5].strip().upper() in ("1", "STOP", "TRUE")
+    return tool, path, count, req_id, target, stop_on_fail
+
+
+def execute_repeat(tool, path, count, stop_on_fail, on_iteration, on_message=None, target=None,
+                   pool=None, cancel=None):
+    """
+    Run the same job `count` times back-to-back on one target (and its warm
+    TRACE32 session). on_iteration(i, verdict, seconds, result) is called
+    after every run; the return value is the soak summary.
+    """
+    durations = []
+    failed = 0
+    for i in range(1, count + 1):
+        start = time.monotonic()
+        if cancel is not None and cancel.is_set():
+            break
+        result = execute_job(tool, path, i, on_message, target, pool, cancel=cancel)
+        durations.append(time.monotonic() - start)
+        verdict = verdict_of(result)
+        if verdict != "PASS":
+            failed += 1
+        on_iteration(i, verdict, durations[-1], result)
+        if failed and stop_on_fail:
+            break
+
+    verdict = "FAIL" if failed else "PASS"
+    return (f"{verdict}: {len(durations) - failed}/{len(durations)} passed, {failed} failed "
+            f"({count} requested)\n{format_durations(durations)}")
 
+
+def execute_test(test, on_message=None, target=None, pool=None, cancel=None):
+    """One RUNSUITE test on the leased target: (result, seconds, target name)."""
+    start = time.monotonic()
+    result = execute_job(test.tool, test.path, test.index, on_message, target, pool, test.timeout, cancel)
+    return result, time.monotonic() - start, target.name if target else ""
+
+
+def parse_memory(msg):
+    """
+    Parse 'READMEM|ADDRESS|SIZE[|ID[|TARGET]]' (WRITEMEM alike) into
+    (address, size, access, req_id, target). ADDRESS may carry an access
+    class prefix (D: data, the default, or P: program).
+    """
+    parts = msg.split("|") + [""] * 2
+    address = parts[1].strip()
+    access = ACCESS["D"]
+    if address[1:2] == ":":
+        if address[0].upper() not in ACCESS:
+            raise ValueError(f"ERROR: Unknown access class '{address[0]}'")
+        access, address = ACCESS[address[0].upper()], address[2:]
+    try:
+        address, size = int(address, 0), int(parts[2].strip(), 0)
+    except ValueError:
+        raise ValueError("ERROR: Invalid address/size")
+    if not 0 <= address <= 0xFFFFFFFF or not 0 < size <= MAX_TRANSFER:
+        raise ValueError(f"ERROR: Invalid address/size (size 1..{MAX_TRANSFER})")
+    return address, size, access, parts[3].strip() or "0", parts[4].strip()
+
+
+def execute_memory(command, address, access, target=None, pool=None, out=None, data=None, cancel=None):
+    # READMEM fills `out`, WRITEMEM writes `data`; runs on an executor thread
+    try:
+        if pool is not None:
+            deadline = job_deadline(get_settings())
+            if command == "READMEM":
+                result = pool.read_memory(target, address, out, access, deadline, cancel)
+            else:
+                result = pool.write_memory(target, address, data, access, deadline, cancel)
+        else:
+            from trace32.mem_transfer import read_target, write_target
+            if command == "READMEM":
+                result = read_target(address, len(out), out, target, access)
+            else:
+                result = write_target(address, data, target, access)
     except Exception as e:
-        print(f"[PYTHON] Exception with client {addr}: {e}")
+        result = f"FAIL: {e}"
+    if not result.startswith("PASS"):
+        count("t32_errors_total", tool=command, kind="fail")
+    return result
 
 
-def start_server():
-    print("[PYTHON] Server starting...")
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as srv:
-        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        srv.bind((HOST, PORT))
-        srv.listen(5)
-        print(f"[PYTHON] Listening on {HOST}:{PORT}")
+def verdict_of(result):
+    return "PASS" if result.startswith("PASS") else "FAIL"
+
+
+def legacy_payload(count_index, result):
+    return f"[{count_index}] {result}\n\n{EOT}\n".encode(errors="ignore")
+
+
+def frame(kind, req_id, text=""):
+    # Protocol v2 frame: "KIND|ID|LENGTH\n" followed by LENGTH bytes of UTF-8
+    data = text.encode(errors="ignore")
+    return f"{kind}|{req_id}|{len(data)}\n".encode() + data
+
+
+class CommandReader:
+    """
+    Async iterator over newline-terminated commands. In v1 a partial line
+    with no further data within LEGACY_FLUSH is yielded as-is, for clients
+    that send one command per packet without a newline; `version` >= 2
+    (set after PROTO|2) makes framing strictly newline-delimited. read_into() takes the binary
+    payload that follows a command (WRITEMEM); wait_eof() watches for the
+    client closing while a v1 command runs.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.buffer = b""
+        self.eof = False
+        self.version = 1
+
+    def __aiter__(self):
+        return self
 
+    async def __anext__(self):
         while True:
-            conn, addr = srv.accept()
-            threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+            nl = self.buffer.find(b"\n")
+            if nl >= 0:
+                line, self.buffer = self.buffer[:nl], self.buffer[nl + 1:]
+                return line
+            if len(self.buffer) > MAX_LINE:
+                raise ValueError("ERROR: Command too long")
+            if self.eof:
+                line, self.buffer = self.buffer, b""
+                if line.strip() and self.version < 2:
+                    return line
+                raise StopAsyncIteration       # v2: an unterminated last line is incomplete
+            flush = LEGACY_FLUSH if self.buffer and self.version < 2 else None
+            try:
+                data = await asyncio.wait_for(self.reader.read(4096), flush)
+            except asyncio.TimeoutError:
+                line, self.buffer = self.buffer, b""
+                return line
+            if not data:
+                self.eof = True
+                continue
+            self.buffer += data
+
+    async def wait_eof(self):
+        """Buffer whatever the client sends until it closes its side of the connection."""
+        while not self.eof:
+            data = await self.reader.read(4096)
+            if not data:
+                self.eof = True
+            elif len(self.buffer) <= MAX_LINE:
+                self.buffer += data
+
+    async def read_into(self, view):
+        """Fill the writable memoryview `view` straight from the stream."""
+        n = min(len(self.buffer), len(view))
+        view[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        while n < len(view):
+            data = await self.reader.read(min(len(view) - n, PAYLOAD_CHUNK))
+            if not data:
+                raise ConnectionError("client closed the connection during a payload")
+            view[n:n + len(data)] = data
+            n += len(data)
+
+
+class Job:
+    def __init__(self, func, want, future, cancel=None):
+        self.func = func        # func(target), run on the executor
+        self.want = want
+        self.future = future
+        self.cancel = cancel    # threading.Event the job's runner watches, if any
+        self.ended = asyncio.Event()
+        self.queued = time.monotonic()
+
+
+class Flight:
+    """One running RUN that identical requests can join (see Dispatcher.submit)."""
+
+    def __init__(self, on_message=None):
+        self.listeners = [on_message] if on_message else []
+        self.callers = 0
+        self.cancel = threading.Event()
+        self.task = None
+
+    def publish(self, line):
+        # called from the runner thread; listeners queue the frame on the loop
+        for listener in tuple(self.listeners):
+            listener(line)
+
+
+class Dispatcher:
+    """
+    Schedules RUN jobs onto targets. Each job leases one free target that
+    matches its requirement; a target runs one job at a time, different
+    targets run in parallel on the executor. Jobs that cannot be placed
+    wait in FIFO order without holding up jobs for other targets; beyond
+    [runtime] queue_limit waiting jobs a request is answered BUSY at once.
+
+    Unless targets/workers are passed in, both follow config.ini: a reload
+    adds new targets right away and retires removed or changed ones once
+    their current job has finished.
+
+    With isolation "process" ([runtime] isolation, the default) runners
+    execute in one worker process per target (workers.py); "thread" runs
+    them on the executor threads directly.
+
+    Identical RUNs (same tool, path, index and target, both streamed or
+    both not) are coalesced: a request arriving while one is running joins
+    it. With `cache` (v2, where
+    the index is a request ID rather than CANoe's counter) one arriving
+    within result_cache_seconds after a PASS gets the same result; failures
+    are never replayed, they may be runner or connection problems.
+
+    A caller whose task is cancelled (CANCEL, disconnect) withdraws its job:
+    a waiting job is dropped, a running one is asked to stop through its
+    cancel Event. A coalesced run is only cancelled once all callers left.
+    """
+
+    def __init__(self, workers=None, targets=None, isolation=None, initializer=None):
+        s = get_settings()
+        self.fixed_workers = workers
+        self.fixed_targets = targets is not None
+        self.generation = s.generation
+        self.targets = list(targets) if targets is not None else load_targets()
+        self.free = list(self.targets)
+        self.leased = set()
+        self.waiting = []
+        self.running = set()
+        self.executor = ThreadPoolExecutor(max_workers=MAX_RUNNER_THREADS, thread_name_prefix="runner")
+        # starts and stops worker processes off the event loop, in order
+        self.maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workers")
+        self.pending = None             # targets of a reload whose workers are still starting
+        self.isolation = isolation or s.isolation
+        self.pool = WorkerPool(initializer) if self.isolation == "process" else None
+        self.flights = {}               # (tool, path, index, want, streaming) -> Flight
+        self.recent = OrderedDict()     # (tool, path, index, want, streaming) -> (expires, result)
+        self.spare = None               # warm standby endpoint of the [runtime] target, see failover()
+
+    @property
+    def workers(self):
+        workers = self.fixed_workers if self.fixed_workers is not None else get_settings().workers
+        return min(workers, len(self.targets)) if workers > 0 else len(self.targets)
+
+    def refresh(self):
+        s = get_settings()
+        if self.fixed_targets or s.generation == self.generation:
+            return
+        self.generation = s.generation
+        try:
+            loaded = load_targets(s)
+        except ValueError as e:
+            print(f"[PYTHON] Keeping previous targets, invalid [targets]: {e}")
+            return
+        current = {t.name: t for t in self.targets}
+        targets = []
+        for new in loaded:
+            old = current.get(new.name)
+            targets.append(old if old is not None and old.same_endpoint(new) else new)
+        if self.pool is None:
+            self._use_targets(targets)
+            return
+        # starting and stopping worker processes blocks for seconds, so it
+        # runs on the maintenance thread; the new targets are used once their
+        # workers are up, and removed ones are retired after that
+        self.pending = targets
+        self._track(asyncio.ensure_future(self._swap_targets(targets, s.generation)))
+
+    async def _swap_targets(self, targets, generation):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.maintenance, self.pool.prestart, targets)
+        if generation == self.generation:       # not overtaken by a newer reload
+            self.pending = None
+            self._use_targets(targets)
+            self._schedule()
+        self._sync_workers()
+
+    def _use_targets(self, targets):
+        self.targets = targets
+        # a renamed/changed target on a busy endpoint waits for that job to end
+        busy = {(t.node, t.port) for t in self.leased}
+        self.free = [t for t in targets if t not in self.leased and (t.node, t.port) not in busy]
+        print(f"[PYTHON] Targets: {', '.join(t.name for t in self.targets)}")
+
+    def _track(self, future):
+        self.running.add(future)
+        future.add_done_callback(self.running.discard)
+
+    def _sync_workers(self):
+        # start missing workers and retire unused ones on the maintenance thread
+        if self.pool:
+            targets = self.targets + ([self.spare] if self.spare else [])
+            self._track(asyncio.get_running_loop().run_in_executor(self.maintenance, self.pool.sync, targets))
+
+    def _default_target(self):
+        # the [runtime] trace32_node/port endpoint; None when [targets] is used
+        if self.fixed_targets or get_settings().targets:
+            return None
+        return next((t for t in self.targets if t.name == "default"), None)
+
+    def standby(self, port):
+        """Keep a worker connected to the standby TRACE32 on `port`, ready for failover()."""
+        current = self._default_target()
+        if current is None:
+            return
+        self.spare = Target(current.name, current.node, port, current.packlen, current.capabilities)
+        self._sync_workers()
+
+    def failover(self, port):
+        """
+        Switch the [runtime] target to the promoted standby on `port` in
+        memory, for the next job; config.ini is updated separately and the
+        reload then finds the same endpoint.
+        """
+        old = self._default_target()
+        if old is None or old.port == str(port):
+            return
+        new = self.spare if self.spare and self.spare.port == str(port) else \
+            Target(old.name, old.node, port, old.packlen, old.capabilities)
+        self.spare = None
+        self.targets = [new if t is old else t for t in self.targets]
+        if old in self.free:
+            self.free.remove(old)
+        self.free.append(new)       # a job still on the old endpoint fails on its own
+        print(f"[PYTHON] Target {new.name} switched to port {new.port}")
+        self._sync_workers()
+        self._schedule()
+
+    def start(self):
+        print(f"[PYTHON] Targets: {', '.join(t.name for t in self.targets)}")
+        if self.pool:
+            self.pool.sync(self.targets)     # pre-start one worker per target
+            print(f"[PYTHON] Started {len(self.targets)} runner process(es)")
+
+    async def stop(self):
+        await asyncio.gather(*self.running, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+        self.maintenance.shutdown(wait=True)
+        if self.pool:
+            self.pool.close()
+
+    async def submit(self, tool, path, count_index, on_message=None, want="", cache=False):
+        # on_message is called from the executor thread. A streamed run drops
+        # the log from its result, so only runs of the same kind are joined.
+        streaming = on_message is not None
+        key = (tool, path, count_index, want, streaming)
+        now = time.monotonic()
+        while self.recent and next(iter(self.recent.values()))[0] <= now:
+            self.recent.popitem(last=False)
+        if cache and key in self.recent:
+            print(f"[PYTHON] {path} (index={count_index}) just finished, repeating its result")
+            count("t32_coalesced_total", kind="cache")
+            return self.recent[key][1]
+
+        flight = self.flights.get(key)
+        if flight is not None:
+            print(f"[PYTHON] {path} (index={count_index}) is already running, joining it")
+            count("t32_coalesced_total", kind="inflight")
+            if on_message:
+                flight.listeners.append(on_message)
+        else:
+            flight = self.flights[key] = Flight(on_message)
+            flight.task = asyncio.ensure_future(self.submit_call(
+                lambda target: execute_job(tool, path, count_index, flight.publish if streaming else None,
+                                           target, self.pool, cancel=flight.cancel),
+                want, flight.cancel,
+            ))
+            flight.task.add_done_callback(lambda task: self._landed(key, task))
+        flight.callers += 1
+        try:
+            # a caller that goes away does not cancel the run for the others
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.callers -= 1
+            if on_message in flight.listeners:
+                flight.listeners.remove(on_message)
+            if flight.callers == 0:
+                # a new identical RUN must start afresh, not join the stopping one
+                self.flights.pop(key, None)
+                flight.task.cancel()
+                await asyncio.wait([flight.task])
+            raise
+
+    def _landed(self, key, task):
+        flight = self.flights.get(key)
+        if flight is not None and flight.task is task:
+            del self.flights[key]
+        ttl = get_settings().result_cache_seconds
+        if ttl > 0 and not task.cancelled() and task.exception() is None and task.result().startswith("PASS"):
+            self.recent[key] = (time.monotonic() + ttl, task.result())
+
+    async def submit_call(self, func, want="", cancel=None):
+        """
+        Run func(target) on the executor once a matching target is leased.
+        If the caller is cancelled, `cancel` (the Event func's runner
+        watches) is set and a job still waiting is dropped; for a running
+        one the caller waits, up to twice CANCEL_GRACE, until the target is
+        free again.
+        """
+        self.refresh()
+        if not any(t.matches(want) for t in self.targets + (self.pending or [])):
+            return f"FAIL: No target matches '{want}'"
+        limit = get_settings().queue_limit
+        if limit and len(self.waiting) >= limit:
+            count("t32_errors_total", kind="busy")
+            return f"FAIL: BUSY: {len(self.waiting)} requests waiting, try again later"
+        future = asyncio.get_running_loop().create_future()
+        job = Job(func, want, future, cancel)
+        self.waiting.append(job)
+        self._schedule()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if cancel is not None:
+                cancel.set()
+            if job in self.waiting:
+                self.waiting.remove(job)
+                gauge("t32_jobs_waiting").set(len(self.waiting))
+            elif cancel is not None:
+                try:
+                    await asyncio.wait_for(job.ended.wait(), 2 * CANCEL_GRACE)
+                except asyncio.TimeoutError:
+                    pass        # thread isolation: a runner that ignores `cancel` runs to its end
+            raise
+
+    def _schedule(self):
+        for job in list(self.waiting):
+            if len(self.leased) >= self.workers:
+                return
+            target = next((t for t in self.free if t.matches(job.want)), None)
+            if target is None:
+                continue
+            self.waiting.remove(job)
+            self.free.remove(target)
+            self.leased.add(target)
+            observe("t32_queue_wait_seconds", time.monotonic() - job.queued, target=target.name)
+            self._track(asyncio.ensure_future(self._run(job, target)))
+        gauge("t32_jobs_waiting").set(len(self.waiting))
+        gauge("t32_jobs_running").set(len(self.leased))
+
+    async def _run(self, job, target):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, job.func, target)
+        except Exception as e:
+            result = f"FAIL: {e}"
+        finally:
+            job.ended.set()
+            self.leased.discard(target)
+            if target in self.targets:      # not retired by a reload meanwhile
+                self.free.append(target)
+            else:
+                self.free.extend(t for t in self.targets
+                                 if (t.node, t.port) == (target.node, target.port)
+                                 and t not in self.free and t not in self.leased)
+            self._schedule()
+        if not job.future.done():
+            job.future.set_result(result)
+
+
+class ClientConnection:
+    """
+    One connected client. Starts in the legacy protocol (v1): one command at
+    a time, answered with "[INDEX] result" and the EOT marker. After
+    "PROTO|2" the connection switches to v2: RUN requests are pipelined,
+    TRACE32 messages are streamed as MSG frames while the script runs and
+    each completion is sent as a verdict frame tagged with the request ID
+    (the INDEX field), in whatever order the runs finish.
+
+    "CANCEL|ID" stops the pipelined request(s) with that ID, which then
+    answer "FAIL: Cancelled". When the client closes the connection (EOF)
+    or it drops, every request still running for it is cancelled the same
+    way; a v1 command keeps the socket watched while it runs for this.
+    """
+
+    def __init__(self, reader, writer, dispatcher):
+        self.reader = reader
+        self.writer = writer
+        self.dispatcher = dispatcher
+        self.addr = writer.get_extra_info("peername") or "local"     # "" for AF_UNIX, None for pipes
+        self.version = 1
+        self.pending = set()
+        self.requests = {}      # request ID -> its running tasks, for CANCEL
+        self.commands = CommandReader(reader)
+
+    async def send(self, data):
+        if self.writer.is_closing():
+            return
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def send_threadsafe(self, loop, data):
+        # Called from runner threads; frames keep their order on the loop
+        loop.call_soon_threadsafe(self._write, data)
+
+    def _write(self, data):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def track(self, req_id, coro):
+        # a pipelined (v2) request: answered in the background, cancellable by ID
+        task = asyncio.ensure_future(coro)
+        tasks = self.requests.setdefault(str(req_id), set())
+        tasks.add(task)
+        self.pending.add(task)
+
+        def done(task):
+            self.pending.discard(task)
+            tasks.discard(task)
+            if not tasks and self.requests.get(str(req_id)) is tasks:
+                del self.requests[str(req_id)]
+        task.add_done_callback(done)
+        return task
+
+    def cancel_pending(self, reason):
+        running = [task for task in self.pending if not task.done()]
+        if running:
+            print(f"[PYTHON] Client {self.addr} is gone, cancelling {len(running)} request(s)")
+            count("t32_cancels_total", len(running), reason=reason)
+        for task in running:
+            task.cancel()
+
+    async def inline(self, req_id, coro):
+        # v1 answers one command at a time, so the reply goes out before the
+        # next command is read; meanwhile the socket is watched, and a client
+        # that closes it (EOF) cancels the command like a v2 disconnect
+        task = self.track(req_id, coro)
+        eof = asyncio.ensure_future(self.commands.wait_eof())
+        try:
+            await asyncio.wait([task, eof], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            eof.cancel()
+        if not task.done():
+            self.cancel_pending("disconnect")
+        await asyncio.wait([task])
+
+    async def run(self):
+        print(f"[PYTHON] Client connected: {self.addr}")
+        count("t32_connections_total")
+        active = gauge("t32_connections_active")
+        active.inc()
+        try:
+            async for raw in self.commands:
+                msg = raw.decode(errors="ignore").strip()
+                if msg:
+                    print(f"[PYTHON] Received: {msg!r}")
+                    await self.handle_command(msg)
+            print(f"[PYTHON] Client {self.addr} disconnected.")
+        except ValueError as e:
+            await self.send(f"{e}\n".encode())
+        except (ConnectionError, OSError) as e:
+            print(f"[PYTHON] Exception with client {self.addr}: {e}")
+        finally:
+            self.cancel_pending("disconnect")
+            active.dec()
+            self.writer.close()
+
+    async def handle_command(self, msg):
+        parts = msg.split("|")
+        command = parts[0].upper()
+        req_id = parts[-1] if len(parts) >= 2 else "0"
+        count("t32_requests_total", command=command if command in COMMANDS else "other")
+
+        if command == "PING":
+            await self.send(frame("PONG", req_id) if self.version >= 2 else b"PONG")
+            return
+
+        if command == "PROTO":
+            version = parts[1] if len(parts) >= 2 else ""
+            if version.isdigit() and 1 <= int(version) <= PROTO_VERSION:
+                self.version = self.commands.version = int(version)
+                await self.send(f"PROTO|{self.version}\n".encode())
+            else:
+                await self.send(f"ERROR: Unsupported protocol version (max {PROTO_VERSION})\n".encode())
+            return
+
+        if command == "REPEAT":
+            await self.handle_repeat(msg, parts)
+            return
+
+        if command == "RUNSUITE":
+            await self.handle_suite(msg, parts)
+            return
+
+        if command == "CANCEL":
+            await self.handle_cancel(parts)
+            return
+
+        if command == "HISTORY":
+            await self.handle_history(msg)
+            return
+
+        if command in ("READMEM", "WRITEMEM"):
+            await self.handle_memory(command, msg)
+            return
+
+        if command == "STATS":
+            try:
+                prefix, req_id = parse_stats(msg)
+            except ValueError as e:
+                await self.send_error(req_id, e)
+                return
+            text = METRICS.render_text(prefix)
+            if self.version >= 2:
+                await self.send(frame("STATS", req_id, text))
+            else:
+                await self.send(legacy_payload(req_id, text))
+            return
+
+        # Expected format: RUN|PATH|INDEX[|TARGET]
+        try:
+            tool, path, count_index, target = parse_request(msg)
+        except ValueError as e:
+            await self.send_error(parts[2] if len(parts) >= 3 else "0", e)
+            return
+
+        if self.version >= 2:
+            self.track(count_index, self.run_tagged(tool, path, count_index, target))
+        else:
+            await self.inline(count_index, self.run_legacy(tool, path, count_index, target))
+
+    async def run_legacy(self, tool, path, count_index, target):
+        result = await self.dispatcher.submit(tool, path, count_index, want=target)
+        await self.send(legacy_payload(count_index, result))
+
+    async def handle_cancel(self, parts):
+        # CANCEL|ID: the request answers "FAIL: Cancelled" itself once its job has let go of the target
+        req_id = parts[1].strip() if len(parts) >= 2 else ""
+        tasks = [task for task in self.requests.get(req_id, ()) if not task.done()]
+        if not tasks:
+            await self.send_error(req_id or "0", f"ERROR: No running request with ID '{req_id}'")
+            return
+        print(f"[PYTHON] Cancelling request {req_id} of {self.addr}")
+        count("t32_cancels_total", len(tasks), reason="request")
+        for task in tasks:
+            task.cancel()
+
+    async def send_cancelled(self, req_id):
+        try:
+            if self.version >= 2:
+                await self.send(frame("FAIL", req_id, "FAIL: Cancelled"))
+            else:
+                await self.send(legacy_payload(req_id, "FAIL: Cancelled"))
+        except (ConnectionError, OSError):
+            pass
+
+    async def send_error(self, req_id, error):
+        count("t32_errors_total", kind="request")
+        if self.version >= 2:
+            await self.send(frame("ERROR", req_id, str(error)))
+        else:
+            await self.send(f"{error}\n".encode())
+
+    async def handle_history(self, msg):
+        try:
+            filters, req_id = parse_history(msg)
+        except ValueError as e:
+            await self.send_error(history_id(msg), e)
+            return
+        history = get_history(get_settings().history_db)
+        if not history:
+            await self.send_error(req_id, "ERROR: Run history is disabled")
+            return
+        # SQLite off the event loop; the writer thread is never waited for
+        rows, next_cursor = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: history.query(**filters)
+        )
+        text = format_rows(rows, next_cursor)
+        if self.version >= 2:
+            await self.send(frame("HIST", req_id, text))
+        else:
+            await self.send(legacy_payload(req_id, text))
+
+    async def handle_memory(self, command, msg):
+        try:
+            address, size, access, req_id, target = parse_memory(msg)
+        except ValueError as e:
+            if command == "WRITEMEM":
+                raise           # payload length unknown: the stream cannot be resynchronised
+            parts = msg.split("|")
+            await self.send_error(parts[3] if len(parts) >= 4 else "0", e)
+            return
+        data = None
+        if command == "WRITEMEM":
+            data = bytearray(size)
+            with memoryview(data) as view:
+                await self.commands.read_into(view)
+        if self.version < 2:
+            await self.send_error(req_id, f"ERROR: {command} needs protocol v2 (PROTO|2)")
+            return
+        self.track(req_id, self.run_memory(command, address, size, access, req_id, target, data))
+
+    async def run_memory(self, command, address, size, access, req_id, target, data):
+        # READMEM: "DATA|ID|SIZE\n" + raw bytes, then the verdict frame with the throughput
+        out = bytearray(size) if command == "READMEM" else None
+        cancel = threading.Event()
+        try:
+            result = await self.dispatcher.submit_call(
+                lambda lease: execute_memory(command, address, access, lease, self.dispatcher.pool, out, data,
+                                             cancel),
+                target, cancel,
+            )
+        except asyncio.CancelledError:
+            await self.send_cancelled(req_id)
+            return
+        try:
+            if out is not None and result.startswith("PASS"):
+                self._write(f"DATA|{req_id}|{size}\n".encode())
+                self._write(memoryview(out))     # the transport sends from the buffer itself
+            await self.send(frame(verdict_of(result), req_id, result))
+        except (ConnectionError, OSError):
+            pass
+
+    async def handle_repeat(self, msg, parts):
+        try:
+            tool, path, count, req_id, target, stop_on_fail = parse_repeat(msg)
+        except ValueError as e:
+            await self.send_error(parts[3] if len(parts) >= 4 else "0", e)
+            return
+        if self.version >= 2:
+            self.track(req_id, self.run_repeat(tool, path, count, req_id, target, stop_on_fail))
+        else:
+            await self.inline(req_id, self.run_repeat(tool, path, count, req_id, target, stop_on_fail))
+
+    async def run_repeat(self, tool, path, count, req_id, target, stop_on_fail):
+        # Iteration verdicts are streamed; v1 ends with the summary and EOT
+        loop = asyncio.get_running_loop()
+        on_message = None
+        if self.version >= 2:
+            def on_message(line):
+                self.send_threadsafe(loop, frame("MSG", req_id, line))
+
+        def on_iteration(i, verdict, seconds, result):
+            line = f"{i}/{count} {verdict} {seconds:.3f}s"
+            if verdict != "PASS":
+                line += "\n" + result
+            if self.version >= 2:
+                self.send_threadsafe(loop, frame("ITER", req_id, line))
+            else:
+                self.send_threadsafe(loop, f"[{req_id}.{i}] {line}\n".encode(errors="ignore"))
+
+        cancel = threading.Event()
+        try:
+            summary = await self.dispatcher.submit_call(
+                lambda lease: execute_repeat(tool, path, count, stop_on_fail, on_iteration, on_message, lease,
+                                             self.dispatcher.pool, cancel),
+                target, cancel,
+            )
+        except asyncio.CancelledError:
+            await self.send_cancelled(req_id)
+            return
+        try:
+            if self.version >= 2:
+                await self.send(frame(verdict_of(summary), req_id, summary))
+            else:
+                await self.send(legacy_payload(req_id, summary))
+        except (ConnectionError, OSError):
+            pass
+
+    async def handle_suite(self, msg, parts):
+        try:
+            manifest, req_id, tags = parse_suite(msg)
+            default_output = os.path.join(get_settings().tmp_dir, "suites")
+            suite = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: load_manifest(manifest, tags, default_output)
+            )
+            for test in suite.tests:
+                test.tool = detect_tool(test.path)
+                if test.tool not in TOOL_REGISTRY:
+                    raise ValueError(f"ERROR: Test '{test.name}': unknown or unsupported tool")
+        except ValueError as e:
+            await self.send_error(parts[2].strip() if len(parts) >= 3 else "0", e)
+            return
+        print(f"[PYTHON] Suite {suite.name}: {len(suite.tests)} test(s) from {manifest}")
+        if self.version >= 2:
+            self.track(req_id, self.run_suite(suite, req_id))
+        else:
+            await self.inline(req_id, self.run_suite(suite, req_id))
+
+    async def run_suite(self, suite, req_id):
+        # Per-test verdicts are streamed as they finish; then the summary with the report paths
+        loop = asyncio.get_running_loop()
+        pool = self.dispatcher.pool
+
+        def messages_of(test):
+            if self.version < 2:
+                return None
+            return lambda line: self.send_threadsafe(loop, frame("MSG", req_id, f"[{test.name}] {line}"))
+
+        async def run_test(test):
+            on_message = messages_of(test)
+            cancel = threading.Event()
+            result = await self.dispatcher.submit_call(
+                lambda lease: execute_test(test, on_message, lease, pool, cancel), test.target, cancel
+            )
+            # a FAIL text instead of the tuple: no matching target, or the job raised
+            return result if isinstance(result, tuple) else (result, 0.0, "")
+
+        def on_result(test):
+            count("t32_suite_tests_total", verdict=test.verdict)
+            if self.version >= 2:
+                self.send_threadsafe(loop, frame("TEST", req_id, test.line()))
+            else:
+                self.send_threadsafe(loop, f"[{req_id}.{test.name}] {test.line()}\n".encode(errors="ignore"))
+
+        try:
+            await run_suite(suite, run_test, on_result)
+        except asyncio.CancelledError:
+            await self.send_cancelled(req_id)
+            return
+        summary = suite.summary()
+        try:
+            junit, canoe = await loop.run_in_executor(None, write_reports, suite)
+            summary += f"\nJUnit: {junit}\nCANoe: {canoe}"
+        except OSError as e:
+            summary += f"\nReports not written: {e}"
+        print(f"[PYTHON] {summary}")
+        try:
+            if self.version >= 2:
+                await self.send(frame(verdict_of(summary), req_id, summary))
+            else:
+                await self.send(legacy_payload(req_id, summary))
+        except (ConnectionError, OSError):
+            pass
+
+    async def run_tagged(self, tool, path, count_index, target):
+        loop = asyncio.get_running_loop()
+
+        def on_message(line):
+            self.send_threadsafe(loop, frame("MSG", count_index, line))
+
+        try:
+            result = await self.dispatcher.submit(tool, path, count_index, on_message, target, cache=True)
+        except asyncio.CancelledError:
+            await self.send_cancelled(count_index)
+            return
+        try:
+            await self.send(frame(verdict_of(result), count_index, result))
+        except (ConnectionError, OSError):
+            pass
+
+
+async def handle_client(reader, writer, dispatcher):
+    await ClientConnection(reader, writer, dispatcher).run()
+
+
+async def handle_metrics(reader, writer):
+    # Minimal HTTP/1.0 responder for Prometheus scrapes: GET /metrics
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+        method, target = (request.split(b" ", 2) + [b"", b""])[:2]
+        if method == b"GET" and target.split(b"?")[0] == b"/metrics":
+            status, body = "200 OK", METRICS.render_prometheus().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+            ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+async def create_server(dispatcher, host=None, port=None):
+    # cli_host/cli_port/backlog are read once; changing them needs a restart
+    s = get_settings()
+    return await asyncio.start_server(
+        lambda r, w: handle_client(r, w, dispatcher),
+        host or s.cli_host, port if port is not None else s.cli_port, backlog=s.backlog
+    )
+
+
+class PipeServer:
+    """Named pipe listener (Windows) with the close()/wait_closed() of asyncio.Server."""
+
+    def __init__(self, pipes):
+        self.pipes = pipes
+
+    def close(self):
+        for pipe in self.pipes:
+            pipe.close()
+
+    async def wait_closed(self):
+        pass
+
+
+async def create_local_server(dispatcher, path=None):
+    """
+    The same protocol on a Unix domain socket (POSIX) or a named pipe
+    (Windows, path like \\\\.\\pipe\\name) for clients on the bench PC.
+    """
+    s = get_settings()
+    path = path or s.local_socket
+    if sys.platform == "win32":
+        def protocol():
+            reader = asyncio.StreamReader()
+            return asyncio.StreamReaderProtocol(reader, lambda r, w: handle_client(r, w, dispatcher))
+        return PipeServer(await asyncio.get_running_loop().start_serving_pipe(protocol, path))
+    def connected(reader, writer):
+        # AF_UNIX does not autotune like loopback TCP: without a larger send
+        # buffer, DATA frames move in 208 KB steps
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, LOCAL_SNDBUF)
+        return handle_client(reader, writer, dispatcher)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # a stale socket file left by a killed server is replaced by start_unix_server
+    return await asyncio.start_unix_server(connected, path, backlog=s.backlog)
+
+
+def start_standby(dispatcher):
+    """Watch TRACE32 with a warm standby in a thread; a promotion switches `dispatcher` in memory."""
+    from trace32_launcher import Standby
+
+    loop = asyncio.get_running_loop()
+    standby = Standby(on_promote=lambda port: loop.call_soon_threadsafe(dispatcher.failover, port),
+                      on_ready=lambda port: loop.call_soon_threadsafe(dispatcher.standby, port))
+
+    def watch():
+        try:
+            standby.start_standby()
+        except Exception as e:
+            print(f"[TRACE32] Standby not ready yet: {e}")
+        standby.watch()
+
+    threading.Thread(target=watch, name="t32-standby", daemon=True).start()
+    return standby
+
+
+async def serve(host=None, port=None, workers=None):
+    s = get_settings()
+    host = host or s.cli_host
+    port = port if port is not None else s.cli_port
+    dispatcher = Dispatcher(workers)
+    dispatcher.start()
+    history = get_history(s.history_db)
+    print(f"[PYTHON] Run history: {history.path if history else 'off'}")
+    standby = None
+    if s.standby_port:
+        try:
+            standby = start_standby(dispatcher)
+        except ValueError as e:
+            print(f"[TRACE32] No standby: {e}")
+    servers = []
+    if s.transport in ("tcp", "both"):
+        servers.append(await create_server(dispatcher, host, port))
+        print(f"[PYTHON] Listening on {host}:{port} ({dispatcher.workers} worker(s))")
+    if s.transport in ("local", "both"):
+        servers.append(await create_local_server(dispatcher))
+        print(f"[PYTHON] Listening on {s.local_socket} ({dispatcher.workers} worker(s))")
+    if s.metrics_port:
+        servers.append(await asyncio.start_server(handle_metrics, s.metrics_host, s.metrics_port))
+        print(f"[PYTHON] Metrics on http://{s.metrics_host}:{s.metrics_port}/metrics")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if standby:
+            standby.stop()
+        for server in servers:
+            server.close()
+        if s.transport != "tcp" and sys.platform != "win32" and os.path.exists(s.local_socket):
+            os.remove(s.local_socket)
+        await dispatcher.stop()
+
+
+def start_server():
+    print("[PYTHON] Server starting...")
+    asyncio.run(serve())
 
 
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    start_server()
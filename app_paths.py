@@ -0,0 +1,25 @@
+# app_paths.py
+# GUI-free location helpers shared by the server, the tools and the wizard.
+import os
+import sys
+
+
+def get_app_folder():
+    """
+    Returns the folder where the EXE is located (not the PyInstaller temp folder).
+    """
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.abspath(os.path.dirname(__file__))
+
+# Path to config.ini (always next to our exe or script)
+APP_DIR = get_app_folder()
+CONFIG_PATH = os.path.join(APP_DIR, "config.ini")
+TOOLS_DIR = os.path.join(APP_DIR, "tools")
+
+def try_local_file(*relative_path):
+    """
+    Look for a file relative to the EXE/script location.
+    """
+    path = os.path.join(get_app_folder(), *relative_path)
+    return path if os.path.isfile(path) else ""
@@ -2,10 +2,13 @@
 # This module provides functionality to manage application configuration.
 import os
 import sys
+import json
 import tempfile
 import configparser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from app_paths import get_app_folder, APP_DIR, CONFIG_PATH, try_local_file
 def ensure_config(force: bool = False) -> configparser.ConfigParser:
     """
     Guarantee that CONFIG_PATH exists and contains all required fields.
@@ -61,58 +64,125 @@ def ensure_config(force: bool = False) -> configparser.ConfigParser:
 
     return cfg
 
-def get_app_folder():
-    """
-    Returns the folder where the EXE is located (not the PyInstaller temp folder).
-    """
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)
-    return os.path.abspath(os.path.dirname(__file__))
-
-# Path to config.ini (always next to our exe or script)
-APP_DIR = get_app_folder()
-CONFIG_PATH = os.path.join(APP_DIR, "config.ini")
-
-def try_local_file(*relative_path):
-    """
-    Look for a file relative to the EXE/script location.
-    """
-    path = os.path.join(get_app_folder(), *relative_path)
-    return path if os.path.isfile(path) else ""
+SEARCH_ROOTS  = ["C:\\"]
+SEARCH_DEPTH  = 10
+SCAN_WORKERS  = 16
+SCAN_BATCH    = 32
+TOOL_FILES    = ("t32marm.exe", "t32api64.dll", "config.t32")
+INDEX_PATH    = os.path.join(APP_DIR, ".detect_index.json")
+EXCLUDE_DIRS  = {"Windows", "Program Files", "Program Files (x86)",
+                 "$Recycle.Bin", "System Volume Information", "System32"}
 
-def fast_find(filename, roots=["C:\\"], max_depth=10):
-    exclude = {"Windows", "Program Files", "Program Files (x86)",
-               "$Recycle.Bin", "System Volume Information", "System32"}
 
-    def search(path, depth):
-        if depth > max_depth:
-            return None
+def _scan_dirs(paths, wanted):
+    # One thread task scans a batch of directories to keep scheduling cheap
+    found, subdirs = {}, []
+    for path in paths:
         try:
             with os.scandir(path) as entries:
-                dirs = []
                 for entry in entries:
-                    if entry.name in exclude and entry.is_dir():
-                        continue
-                    if entry.is_file() and entry.name.lower() == filename.lower():
-                        return entry.path
-                    if entry.is_dir():
-                        dirs.append(entry.path)
-                for d in dirs:
-                    res = search(d, depth + 1)
-                    if res:
-                        return res
-        except (PermissionError, FileNotFoundError):
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in EXCLUDE_DIRS:
+                                subdirs.append(entry.path)
+                        elif entry.name.lower() in wanted:
+                            found.setdefault(entry.name.lower(), entry.path)
+                    except OSError:
+                        pass
+        except OSError:
             pass
+    return found, subdirs
+
+
+def _dir_mtime(path):
+    try:
+        return os.stat(os.path.dirname(path)).st_mtime_ns
+    except OSError:
         return None
 
-    for root in roots:
-        found = search(root, 0)
-        if found:
-            return found
-    return None
+
+def _load_index(index_path, key):
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f).get(key, {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index_path, key, entries):
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data[key] = entries
+    tmp = index_path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, index_path)
+    except OSError as e:
+        print(f"[ConfigWizard] Could not save detection index: {e}")
+
+
+def find_files(filenames, roots=None, max_depth=SEARCH_DEPTH, workers=SCAN_WORKERS, index_path=INDEX_PATH):
+    """
+    Locate several files in one walk over `roots`, scanning directories in
+    parallel. Returns {lowercase filename: path} for the files found.
+    Hits are remembered in `index_path` and reused while the containing
+    directory's mtime is unchanged (pass index_path=None to disable).
+    """
+    roots = list(roots or SEARCH_ROOTS)
+    wanted = {name.lower() for name in filenames}
+    key = os.pathsep.join(roots)
+    results = {}
+
+    index = _load_index(index_path, key) if index_path else {}
+    for name in wanted:
+        entry = index.get(name)
+        if entry and os.path.isfile(entry["path"]) and _dir_mtime(entry["path"]) == entry["mtime"]:
+            results[name] = entry["path"]
+
+    missing = wanted - set(results)
+    if missing:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(_scan_dirs, [root], missing): 0 for root in roots}
+            while pending and missing - set(results):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = pending.pop(future)
+                    found, subdirs = future.result()
+                    for name, path in found.items():
+                        results.setdefault(name, path)
+                    if depth < max_depth:
+                        for i in range(0, len(subdirs), SCAN_BATCH):
+                            batch = subdirs[i:i + SCAN_BATCH]
+                            pending[pool.submit(_scan_dirs, batch, missing)] = depth + 1
+            for future in pending:
+                future.cancel()
+
+        if index_path:
+            index.update({name: {"path": path, "mtime": _dir_mtime(path)} for name, path in results.items()})
+            _save_index(index_path, key, index)
+
+    return results
+
+
+def fast_find(filename, roots=None, max_depth=SEARCH_DEPTH):
+    return find_files([filename], roots, max_depth).get(filename.lower())
+
+
+_detected = None
+
+def detect_tools(refresh=False):
+    """All TRACE32 files in one search, shared by the wizard fields."""
+    global _detected
+    if _detected is None or refresh:
+        _detected = find_files(TOOL_FILES)
+    return _detected
 
 def get_trace32_exe():
-    exe_path = try_local_file("bin", "windows64", "t32marm.exe") or fast_find("t32marm.exe")
+    exe_path = try_local_file("bin", "windows64", "t32marm.exe") or detect_tools().get("t32marm.exe")
     if not exe_path:
         root = tk.Tk()
         root.withdraw()
@@ -122,10 +192,10 @@ def get_trace32_exe():
     return exe_path or ""
 
 def get_trace32_dll():
-    return try_local_file("dll", "t32api64.dll") or fast_find("t32api64.dll") or ""
+    return try_local_file("dll", "t32api64.dll") or detect_tools().get("t32api64.dll") or ""
 
 def get_trace32_config():
-    return try_local_file("config.t32") or fast_find("config.t32") or ""
+    return try_local_file("config.t32") or detect_tools().get("config.t32") or ""
 
 def get_canoe_cfg():
     return os.path.join(get_app_folder(), "canoe", "Configuration1.cfg")
@@ -250,6 +320,7 @@ class ConfigWizard(ttk.Frame):
 
 
     def _refresh_detection(self):
+        detect_tools(refresh=True)
         updated_any = False
         for sec, key, _, default, _, _ in self.items:
             key_full = f"{sec}.{key}"
@@ -0,0 +1,83 @@
+# bench_detect.py
+# Tool auto-detection on a synthetic directory tree: the former serial
+# per-file walk vs. the single-pass parallel find_files, cold and indexed.
+# usage: python bench/bench_detect.py [fanout] [depth]
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import auto_config
+
+
+def build_tree(root, fanout, depth):
+    dirs = [root]
+    for level in range(depth):
+        nxt = []
+        for d in dirs:
+            for i in range(fanout):
+                sub = os.path.join(d, f"d{level}_{i}")
+                os.mkdir(sub)
+                open(os.path.join(sub, "readme.txt"), "w").close()
+                nxt.append(sub)
+        dirs = nxt
+    # place the tools in leaf directories spread over the tree
+    step = len(dirs) // 4
+    for name, d in zip(auto_config.TOOL_FILES, dirs[step::step]):
+        open(os.path.join(d, name), "w").close()
+    return len(dirs)
+
+
+def serial_find(filename, root, max_depth=auto_config.SEARCH_DEPTH):
+    # former auto_config.fast_find: depth-first, one file per walk
+    def search(path, depth):
+        if depth > max_depth:
+            return None
+        try:
+            with os.scandir(path) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower() == filename.lower():
+                        return entry.path
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                for d in subdirs:
+                    res = search(d, depth + 1)
+                    if res:
+                        return res
+        except OSError:
+            pass
+        return None
+    return search(root, 0)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+if __name__ == "__main__":
+    fanout = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "tree")
+        os.mkdir(root)
+        leaves = build_tree(root, fanout, depth)
+        index = os.path.join(tmp, "index.json")
+        print(f"synthetic tree: fanout {fanout}, depth {depth}, {leaves} leaf dirs")
+
+        t, found = timed(lambda: [serial_find(n, root) for n in auto_config.TOOL_FILES])
+        assert all(found), found
+        print(f"serial walk x3        {t * 1000:9.1f} ms")
+
+        t, found = timed(lambda: auto_config.find_files(auto_config.TOOL_FILES, [root], index_path=index))
+        assert len(found) == 3, found
+        print(f"parallel single pass  {t * 1000:9.1f} ms")
+
+        t, found = timed(lambda: auto_config.find_files(auto_config.TOOL_FILES, [root], index_path=index))
+        assert len(found) == 3, found
+        print(f"indexed re-detection  {t * 1000:9.1f} ms")
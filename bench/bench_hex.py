@@ -0,0 +1,101 @@
+# bench_hex.py
+# HEX_TOOL on large synthetic images: parse throughput of the mmap scanner
+# (Intel HEX and S-record) against a readlines + per-record list parser, and
+# the download of the parsed image to the fake TRACE32 API.
+# usage: python bench/bench_hex.py [image_mb] [record_bytes]
+import binascii
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools"), os.path.dirname(os.path.abspath(__file__))]
+
+from fake_t32 import make_loader
+from trace32 import session
+from trace32.hex_loader import parse_image, run_hex
+
+BASE = 0x08000000
+
+
+def intel_hex(data, base, record):
+    out = []
+    for offset in range(0, len(data), record):
+        address = base + offset
+        if offset == 0 or address & 0xFFFF < record:        # extended linear address
+            r = bytes([2, 0, 0, 4, address >> 24 & 0xFF, address >> 16 & 0xFF])
+            out.append(b":" + binascii.hexlify(r + bytes([-sum(r) & 0xFF])).upper() + b"\r\n")
+        chunk = data[offset:offset + record]
+        r = bytes([len(chunk), address >> 8 & 0xFF, address & 0xFF, 0]) + chunk
+        out.append(b":" + binascii.hexlify(r + bytes([-sum(r) & 0xFF])).upper() + b"\r\n")
+    out.append(b":00000001FF\r\n")
+    return b"".join(out)
+
+
+def srecord(data, base, record):
+    out = []
+    for offset in range(0, len(data), record):
+        chunk = data[offset:offset + record]
+        r = bytes([len(chunk) + 5]) + (base + offset).to_bytes(4, "big") + chunk
+        out.append(b"S3" + binascii.hexlify(r + bytes([~sum(r) & 0xFF])).upper() + b"\r\n")
+    out.append(b"S70500000000FA\r\n")
+    return b"".join(out)
+
+
+def naive_intel_hex(path):
+    # one object per record, joined at the end
+    records, base = [], 0
+    with open(path) as f:
+        for line in f.readlines():
+            line = line.strip()
+            raw = bytes.fromhex(line[1:])
+            if sum(raw) & 0xFF:
+                raise ValueError("checksum")
+            if raw[3] == 0:
+                records.append({"address": base + (raw[1] << 8 | raw[2]), "data": raw[4:-1]})
+            elif raw[3] == 4:
+                base = (raw[4] << 8 | raw[5]) << 16
+    records.sort(key=lambda r: r["address"])
+    return [(records[0]["address"], b"".join(r["data"] for r in records))]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    size = int(float(sys.argv[1]) * (1 << 20)) if len(sys.argv) > 1 else 16 << 20
+    record = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    image = os.urandom(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {"Intel HEX": os.path.join(tmp, "image.hex"), "S-record": os.path.join(tmp, "image.s37")}
+        with open(files["Intel HEX"], "wb") as f:
+            f.write(intel_hex(image, BASE, record))
+        with open(files["S-record"], "wb") as f:
+            f.write(srecord(image, BASE, record))
+        print(f"image {size / 1e6:.1f} MB, {record}-byte records")
+
+        for name, path in files.items():
+            mb = os.path.getsize(path) / 1e6
+            seconds, blocks = timed(parse_image, path)
+            assert len(blocks) == 1 and blocks[0][1] == image
+            print(f"{name:<10} mmap scanner  {seconds:6.2f}s  {mb / seconds:6.1f} MB/s file  "
+                  f"{size / 1e6 / seconds:6.1f} MB/s image")
+        seconds, blocks = timed(naive_intel_hex, files["Intel HEX"])
+        assert blocks[0][1] == image
+        mb = os.path.getsize(files["Intel HEX"]) / 1e6
+        print(f"{'Intel HEX':<10} per-record    {seconds:6.2f}s  {mb / seconds:6.1f} MB/s file")
+
+        # download + CRC verify on the fake API (0.2 ms per memory call)
+        session.set_loader(make_loader(load_latency=0.0, init_latency=0.001, call_latency=0.0,
+                                       latencies={"T32_ReadMemory": 0.0002, "T32_WriteMemory": 0.0002}))
+        result = run_hex(files["Intel HEX"])
+        assert result.startswith("PASS"), result
+        print(f"download:  {result.splitlines()[-1]}")
+
+
+if __name__ == "__main__":
+    main()
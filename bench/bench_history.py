@@ -0,0 +1,91 @@
+# bench_history.py
+# Run history at scale: record() cost on the request path, writer
+# throughput, and HISTORY query latency on a database with millions of rows.
+# usage: python bench/bench_history.py [rows]
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import history
+
+RESULT_PASS = "PASS:\nok\nTimings: connect=1ms, reset=2ms, start=1ms, wait=800ms, collect=20ms, total=824ms"
+RESULT_FAIL = "FAIL:\n[12 earlier lines omitted, full log: C:\\t\\logs\\x.log]\nTimings: wait=90ms, total=95ms"
+
+
+def populate(path, rows, scripts=500, seed=1):
+    # bulk rows straight into SQLite, spread over the last 365 days
+    rnd = random.Random(seed)
+    now = time.time()
+    db = history._connect(path)
+    db.executescript(history.SCHEMA)
+    batch = []
+    for i in range(rows):
+        started = now - 365 * 86400 * (1 - i / rows)
+        script = f"test_{rnd.randrange(scripts):04d}.cmm"
+        verdict = "FAIL" if rnd.random() < 0.05 else "PASS"
+        batch.append((started, 0.8, script, f"C:\\tests\\{script}", "CMM", i, "bench1", verdict,
+                      '{"wait": 0.8}', None))
+        if len(batch) == 50000:
+            with db:
+                db.executemany("INSERT INTO runs (started, duration, script, path, tool, idx, target,"
+                               " verdict, phases, log) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    with db:
+        db.executemany("INSERT INTO runs (started, duration, script, path, tool, idx, target,"
+                       " verdict, phases, log) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    db.close()
+
+
+def timed_query(store, label, repeat=20, **filters):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows, cursor = store.query(**filters)
+    ms = (time.perf_counter() - start) / repeat * 1000
+    print(f"{label:<40} {ms:7.2f} ms  rows={len(rows)}")
+    return cursor
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        start = time.perf_counter()
+        populate(path, rows)
+        print(f"populated {rows} rows in {time.perf_counter() - start:.1f}s")
+
+        store = history.RunHistory(path)
+        n = 20000
+        start = time.perf_counter()
+        for i in range(n):
+            store.record(time.time(), 0.8, "C:\\tests\\live.cmm", "CMM", i, "bench1",
+                         RESULT_FAIL if i % 10 == 0 else RESULT_PASS)
+        queued = time.perf_counter() - start
+        store.flush()
+        total = time.perf_counter() - start
+        print(f"record() {queued / n * 1e6:.1f} us/run on the caller, "
+              f"writer {n / total:.0f} runs/s ({store.dropped} dropped)")
+
+        now = time.time()
+        timed_query(store, "latest page")
+        cursor = timed_query(store, "script=test_0042.cmm", script="test_0042.cmm")
+        timed_query(store, "script=test_0042.cmm, next page", script="test_0042.cmm", before=cursor)
+        timed_query(store, "verdict=FAIL", verdict="FAIL")
+        timed_query(store, "verdict=FAIL, last 7 days", verdict="FAIL", since=now - 7 * 86400)
+        timed_query(store, "30..60 days ago", since=now - 60 * 86400, until=now - 30 * 86400)
+        timed_query(store, "script + FAIL + 90 days", script="test_0042.cmm", verdict="FAIL",
+                    since=now - 90 * 86400)
+        cursor = None
+        start = time.perf_counter()
+        for _ in range(100):
+            _, cursor = store.query(verdict="FAIL", before=cursor)
+        print(f"{'100 pages of verdict=FAIL':<40} {(time.perf_counter() - start) * 1000:7.2f} ms total")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# bench_import.py
+# Server start-up import cost (python -X importtime): headless CLI with lazy
+# runners vs. the former eager imports (wizard/tkinter plus every runner).
+# usage: python bench/bench_import.py [repeats]
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("headless CLI (lazy)", "import CLI"),
+    ("eager (former)", "import auto_config, CLI, trace32.run_cmm, trace32.delta_flash, vflash.run_vflash"),
+]
+
+
+def import_time_us(statement):
+    # sum of the cumulative times of all top-level imports
+    code = f"import sys; sys.path[:0] = [{ROOT!r}, {os.path.join(ROOT, 'tools')!r}]; {statement}"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total, modules = 0, 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules += 1
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, modules
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for label, statement in CASES:
+        samples = sorted(import_time_us(statement) for _ in range(repeats))
+        total, modules = samples[len(samples) // 2]
+        print(f"{label:<22} {total / 1000:7.1f} ms  {modules} modules")
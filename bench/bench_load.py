@@ -0,0 +1,196 @@
+# bench_load.py
+# End-to-end load benchmark: many concurrent clients drive the CLI server
+# over TCP while the runners talk to the fake TRACE32 API (fake_t32.py).
+# The server runs in a child process so it does not share a GIL with the
+# clients. With --isolation process (the default, as in production) every
+# target gets a worker process that installs the fake API itself. Reports
+# requests/s and latency percentiles; --min-rps/--max-p95 turn it into a
+# regression check (exit code 1 when missed).
+#
+# usage: python bench/bench_load.py [--clients 50] [--requests 20] [--targets 4]
+#                                   [--script-ms 20] [--messages 10] [--proto 2]
+#        python bench/bench_load.py --host HOST --port PORT ...   (running server)
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools"), BENCH]
+
+from stats import summarize
+
+EOT = b"<<<EOT>>>\n"
+
+
+def serve(args):
+    # child process: CLI server on fake targets, prints its port
+    import CLI
+    import history
+    import fake_t32
+    from fake_t32 import FakeScript
+    from trace32.targets import Target
+
+    history.set_history(None)
+    options = dict(
+        load_latency=0.0, init_latency=0.01, call_latency=args.call_ms / 1000.0,
+        script_time=args.script_ms / 1000.0, messages=args.messages,
+        # the last line stays on the message line, so the failure is always seen
+        scripts={"fail.cmm": FakeScript.steps(args.script_ms / 1000.0, max(args.messages, 1),
+                                              fail_at=max(args.messages, 1))},
+        drop_rate=args.drop_rate, seed=1,
+    )
+    fake_t32.install(options)
+    targets = [Target(f"bench{i}", "localhost", 20000 + i) for i in range(args.targets)]
+
+    async def run():
+        dispatcher = CLI.Dispatcher(targets=targets, isolation=args.isolation,
+                                    initializer=(fake_t32.install, (options,)))
+        server = await CLI.create_server(dispatcher, "127.0.0.1", 0)
+        print(server.sockets[0].getsockname()[1], flush=True)
+        # drop the server's per-request log; on fd 1 so worker processes inherit it
+        os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+        dispatcher.start()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+def start_server(args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve",
+           "--targets", str(args.targets), "--script-ms", str(args.script_ms),
+           "--messages", str(args.messages), "--call-ms", str(args.call_ms),
+           "--drop-rate", str(args.drop_rate), "--isolation", args.isolation]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    port = int(proc.stdout.readline())
+    return proc, port
+
+
+async def read_reply_v1(reader):
+    data = await reader.readuntil(EOT)
+    return b"] PASS" in data[:32]
+
+
+async def read_reply_v2(reader):
+    # skip MSG frames, return (req_id, passed) of the verdict frame
+    while True:
+        header = await reader.readline()
+        kind, req_id, length = header.decode().rstrip("\n").split("|")
+        await reader.readexactly(int(length))
+        if kind in ("PASS", "FAIL", "ERROR"):
+            return int(req_id), kind == "PASS"
+
+
+async def client_v1(host, port, n, script, latencies, failures, first=0):
+    # indexes first.. are unique per client, so the server does not coalesce them
+    reader, writer = await asyncio.open_connection(host, port)
+    for i in range(n):
+        start = time.perf_counter()
+        writer.write(f"RUN|{script}|{first + i}\n".encode())
+        await writer.drain()
+        if not await read_reply_v1(reader):
+            failures.append(i)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def client_v2(host, port, n, script, window, latencies, failures, first=0):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"PROTO|2\n")
+    await writer.drain()
+    await reader.readline()
+    sent = {}
+    next_id = done = 0
+    while done < n:
+        while next_id < n and len(sent) < window:
+            sent[first + next_id] = time.perf_counter()
+            writer.write(f"RUN|{script}|{first + next_id}\n".encode())
+            next_id += 1
+        await writer.drain()
+        req_id, passed = await read_reply_v2(reader)
+        latencies.append(time.perf_counter() - sent.pop(req_id))
+        if not passed:
+            failures.append(req_id)
+        done += 1
+    writer.close()
+
+
+async def drive(args, host, port):
+    latencies, failures = [], []
+    script = "C:\\tests\\fail.cmm" if args.fail else "C:\\tests\\load.cmm"
+    if args.proto == 2:
+        clients = [client_v2(host, port, args.requests, script, args.window, latencies, failures,
+                             c * args.requests) for c in range(args.clients)]
+    else:
+        clients = [client_v1(host, port, args.requests, script, latencies, failures, c * args.requests)
+                   for c in range(args.clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*clients)
+    return time.perf_counter() - start, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="RUNs per client")
+    parser.add_argument("--proto", type=int, choices=(1, 2), default=2)
+    parser.add_argument("--window", type=int, default=4, help="pipelined RUNs per v2 client")
+    parser.add_argument("--targets", type=int, default=4)
+    parser.add_argument("--script-ms", type=float, default=20)
+    parser.add_argument("--messages", type=int, default=10, help="message lines per script")
+    parser.add_argument("--call-ms", type=float, default=0.1, help="fake API call latency")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fake connection drop probability")
+    parser.add_argument("--isolation", choices=("process", "thread"), default="process",
+                        help="run the runners in worker processes or server threads")
+    parser.add_argument("--fail", action="store_true", help="run a script that reports TestStepFail")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--min-rps", type=float, help="exit 1 if throughput is lower")
+    parser.add_argument("--max-p95", type=float, help="exit 1 if p95 latency (ms) is higher")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    proc = None
+    if args.port:
+        host, port = args.host or "127.0.0.1", args.port
+    else:
+        proc, port = start_server(args)
+        host = "127.0.0.1"
+    try:
+        elapsed, latencies, failures = asyncio.run(drive(args, host, port))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    total = len(latencies)
+    rps = total / elapsed
+    s = summarize(latencies)
+    print(f"{args.clients} clients x {args.requests} RUNs (proto {args.proto}, {args.isolation}), "
+          f"{args.targets} fake target(s), script {args.script_ms:g} ms, {args.messages} messages")
+    print(f"{total} requests in {elapsed:.2f}s: {rps:.1f} req/s, {len(failures)} failed")
+    print(f"latency p50={s['p50'] * 1000:.1f} ms p95={s['p95'] * 1000:.1f} ms "
+          f"p99={s['p99'] * 1000:.1f} ms max={s['max'] * 1000:.1f} ms")
+
+    ok = True
+    if args.min_rps is not None and rps < args.min_rps:
+        print(f"REGRESSION: {rps:.1f} req/s < {args.min_rps:g}")
+        ok = False
+    if args.max_p95 is not None and s["p95"] * 1000 > args.max_p95:
+        print(f"REGRESSION: p95 {s['p95'] * 1000:.1f} ms > {args.max_p95:g} ms")
+        ok = False
+    if not args.fail and failures:
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# bench_memory.py
+# READMEM/WRITEMEM throughput through the CLI server against the fake
+# TRACE32 API: transfer sizes x PACKLEN (chunk size), with the runners in
+# worker processes or in server threads. Each fake memory call costs
+# --call-ms, like one API round trip, so larger chunks pay it less often.
+#
+# usage: python bench/bench_memory.py [--isolation process|thread] [--call-ms 0.2]
+#                                     [--sizes 65536,1048576,16777216] [--packlens 1024,8192]
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools"), BENCH]
+
+import CLI
+import fake_t32
+import history
+from trace32.targets import Target
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def start_server(targets, isolation, options):
+    state, started = {}, threading.Event()
+
+    async def main():
+        dispatcher = CLI.Dispatcher(targets=targets, isolation=isolation,
+                                    initializer=(fake_t32.install, (options,)))
+        dispatcher.start()
+        server = await CLI.create_server(dispatcher, "127.0.0.1", 0)
+        state["port"] = server.sockets[0].getsockname()[1]
+        state["loop"], state["stop"] = asyncio.get_running_loop(), asyncio.Event()
+        started.set()
+        async with server:
+            await state["stop"].wait()
+        await dispatcher.stop()
+
+    thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    started.wait()
+    return state["port"], lambda: (state["loop"].call_soon_threadsafe(state["stop"].set), thread.join())
+
+
+def read_frame(f):
+    kind, req_id, length = f.readline().decode().rstrip("\n").split("|")
+    return kind, f.read(int(length))
+
+
+def transfer(sock, f, command, address, size, target, payload=None):
+    start = time.perf_counter()
+    sock.sendall(f"{command}|0x{address:X}|{size}|1|{target}\n".encode())
+    if payload is not None:
+        sock.sendall(payload)
+    data = None
+    kind, body = read_frame(f)
+    if kind == "DATA":
+        data = body
+        kind, body = read_frame(f)
+    assert kind == "PASS", body
+    return time.perf_counter() - start, data, body.decode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--isolation", choices=("process", "thread"), default="process")
+    parser.add_argument("--call-ms", type=float, default=0.2, help="fake latency per memory call")
+    parser.add_argument("--sizes", default="65536,1048576,16777216")
+    parser.add_argument("--packlens", default="1024,8192")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    CLI.print = _quiet
+    history.set_history(None)
+    options = dict(load_latency=0.0, init_latency=0.001, call_latency=0.0,
+                   latencies={"T32_ReadMemory": args.call_ms / 1000, "T32_WriteMemory": args.call_ms / 1000})
+    fake_t32.install(options)
+    packlens = [int(p) for p in args.packlens.split(",")]
+    targets = [Target(f"mem{p}", "localhost", 20000 + i, p) for i, p in enumerate(packlens)]
+    port, stop = start_server(targets, args.isolation, options)
+
+    sock = socket.create_connection(("127.0.0.1", port))
+    f = sock.makefile("rb")
+    sock.sendall(b"PROTO|2\n")
+    f.readline()
+    print(f"isolation={args.isolation}, {args.call_ms:g} ms per fake memory call")
+    print(f"{'op':<9}{'size':>10}{'packlen':>9}{'end-to-end':>14}{'target':>14}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        payload = os.urandom(size)
+        for target in targets:
+            for command in ("WRITEMEM", "READMEM"):
+                best, report = None, ""
+                for _ in range(args.repeat):
+                    seconds, data, report = transfer(sock, f, command, 0x20000000, size, target.name,
+                                                     payload if command == "WRITEMEM" else None)
+                    if data is not None:
+                        assert data == payload, "read back differs"
+                    best = seconds if best is None else min(best, seconds)
+                target_rate = report.split("(")[1].split(",")[0]
+                print(f"{command:<9}{size:>10}{target.packlen:>9}{size / best / 1e6:>9.1f} MB/s"
+                      f"{target_rate:>14}")
+    sock.shutdown(socket.SHUT_WR)
+    f.read()                    # server closes after the client's EOF
+    sock.close()
+    stop()
+
+
+if __name__ == "__main__":
+    main()
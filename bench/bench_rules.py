@@ -0,0 +1,88 @@
+# bench_rules.py
+# Message classification over a large synthetic TRACE32 log: the former
+# lowercase + substring scan per keyword vs. the compiled RuleSet, with the
+# built-in rules and with a larger project rule set (best of 3 runs each).
+# usage: python bench/bench_rules.py [lines] [extra_rules]
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, ROOT)
+
+from trace32.rules import BUILTIN_RULES, Verdict, build_rules
+
+FAIL_KEYWORDS = ["teststepfail", "[fail]", "test failed", "aborting test", "execution failed"]
+WORDS = ["Step", "check", "register", "R0", "PC", "value", "0x08001234", "ok", "memory", "read",
+         "Flash", "sector", "verify", "CAN", "frame", "timeout", "signal", "counter", "done"]
+
+
+def synthetic_log(lines, fail_every=5000, seed=1):
+    rnd = random.Random(seed)
+    log = []
+    for i in range(lines):
+        msg = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 14)))
+        if i % fail_every == fail_every - 1:
+            msg += " -> TestStepFail"
+        elif i % fail_every == fail_every // 2:
+            msg += " Module7 Error code 42"
+        log.append(f"[{i:06d}] {msg}")
+    return log
+
+
+def legacy(log, keywords):
+    # former MessageReader.poll check
+    hits = 0
+    for msg in log:
+        if any(k in msg.lower() for k in keywords):
+            hits += 1
+    return hits
+
+
+def compiled(log, rules):
+    verdict = Verdict(rules)
+    hits = 0
+    for msg in log:
+        if verdict.check(msg) is not None:
+            hits += 1
+    return hits
+
+
+def timed(func, *args, repeat=3):
+    # best of `repeat`, so the order of the variants does not skew them
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best, result
+
+
+def report(name, secs, hits, lines):
+    print(f"{name:<34} {secs * 1000:8.1f} ms  {lines / secs / 1e6:6.2f} M lines/s  hits={hits}")
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    extra = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    log = synthetic_log(lines)
+
+    project = {f"project_{i}": f"fail: Module{i} (?:Error|Fault) code \\d+" for i in range(extra)}
+    keywords = FAIL_KEYWORDS + [f"module{i} error" for i in range(extra)]
+    print(f"{lines} lines, {len(BUILTIN_RULES)} built-in rules, +{extra} project rules")
+
+    for name, func, arg in (
+        ("legacy keywords (built-in)", legacy, FAIL_KEYWORDS),
+        ("compiled RuleSet (built-in)", compiled, build_rules({})),
+        (f"legacy keywords (+{extra})", legacy, keywords),
+        (f"compiled RuleSet (+{extra} regex)", compiled, build_rules(project)),
+    ):
+        secs, hits = timed(func, log, arg)
+        report(name, secs, hits, lines)
+
+
+if __name__ == "__main__":
+    main()
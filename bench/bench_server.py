@@ -0,0 +1,150 @@
+# bench_server.py
+# Throughput of the asyncio server vs. the former thread-per-connection model.
+# A fake CMM runner holds a single "debugger" lock for RUN_TIME seconds, like a
+# real target that only runs one script at a time.
+# usage: python bench/bench_server.py [clients] [requests_per_client] [idle_clients]
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools")]
+
+import CLI
+import history
+
+history.set_history(None)    # keep benchmark runs out of the run history
+RUN_TIME = 0.005
+_target = threading.Lock()
+
+
+def fake_runner(path):
+    with _target:
+        time.sleep(RUN_TIME)
+    return "PASS:\nbench"
+
+
+CLI.TOOL_REGISTRY["CMM"] = {"runner": fake_runner, "description": "benchmark runner"}
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+CLI.print = _quiet
+
+
+# --- former model: one thread per accepted socket, runner called inline ----
+
+def threaded_handle_client(conn):
+    with conn:
+        while True:
+            data = conn.recv(1024)
+            if not data:
+                break
+            msg = data.decode(errors="ignore").strip()
+            try:
+                tool, path, count_index, _ = CLI.parse_request(msg)
+            except ValueError as e:
+                conn.sendall(f"{e}\n".encode())
+                continue
+            conn.sendall(CLI.legacy_payload(count_index, CLI.execute_job(tool, path, count_index)))
+
+
+def start_threaded_server():
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(5)
+
+    def accept_loop():
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            threading.Thread(target=threaded_handle_client, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return srv.getsockname()[1], srv.close
+
+
+def start_async_server(workers):
+    started = threading.Event()
+    state = {}
+
+    async def main():
+        dispatcher = CLI.Dispatcher(workers, isolation="thread")
+        dispatcher.start()
+        server = await CLI.create_server(dispatcher, "127.0.0.1", 0)
+        state["port"] = server.sockets[0].getsockname()[1]
+        state["loop"] = asyncio.get_running_loop()
+        state["stop"] = asyncio.Event()
+        started.set()
+        async with server:
+            await state["stop"].wait()
+        await dispatcher.stop()
+
+    threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+    started.wait()
+    return state["port"], lambda: state["loop"].call_soon_threadsafe(state["stop"].set)
+
+
+# --- load generator --------------------------------------------------------
+
+def client(port, requests, latencies, first):
+    # distinct indexes per client, so the server does not coalesce them
+    with socket.create_connection(("127.0.0.1", port)) as s:
+        for i in range(first, first + requests):
+            t0 = time.perf_counter()
+            s.sendall(f"RUN|bench.cmm|{i}\n".encode())
+            buf = b""
+            while b"<<EOT>>" not in buf:
+                chunk = s.recv(4096)
+                if not chunk:
+                    return
+                buf += chunk
+            latencies.append(time.perf_counter() - t0)
+
+
+def run_load(port, clients, requests, idle):
+    idle_socks = [socket.create_connection(("127.0.0.1", port)) for _ in range(idle)]
+    latencies = []
+    threads = [threading.Thread(target=client, args=(port, requests, latencies, c * requests))
+               for c in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    peak_threads = 0
+    while any(t.is_alive() for t in threads):
+        peak_threads = max(peak_threads, threading.active_count() - clients - 1)
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - t0
+    for s in idle_socks:
+        s.close()
+    return latencies, elapsed, peak_threads
+
+
+def report(name, latencies, elapsed, peak_threads):
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:<26} {len(latencies) / elapsed:8.1f} req/s  p50={p50 * 1000:7.1f} ms  "
+          f"p95={p95 * 1000:7.1f} ms  server threads={peak_threads}")
+
+
+if __name__ == "__main__":
+    clients  = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    idle     = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    print(f"{clients} clients x {requests} RUNs, {idle} idle connections, run time {RUN_TIME * 1000:.0f} ms")
+
+    port, stop = start_threaded_server()
+    report("thread-per-connection", *run_load(port, clients, requests, idle))
+    stop()
+
+    port, stop = start_async_server(workers=1)
+    report("asyncio, 1 worker", *run_load(port, clients, requests, idle))
+    stop()
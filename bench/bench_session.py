@@ -0,0 +1,51 @@
+# bench_session.py
+# Per-request TRACE32 overhead: connect/teardown per RUN vs. pooled session.
+# usage: python bench/bench_session.py [runs]
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools"), os.path.dirname(os.path.abspath(__file__))]
+
+from trace32 import session
+from fake_t32 import make_loader
+
+NODE, PORT, PACKLEN = "localhost", "20000", "1024"
+
+
+def one_run(pool):
+    with pool.borrow(NODE, PORT, PACKLEN) as api:
+        api.T32_Cmd(b"RESET")
+        api.T32_Cmd(b'DO "bench.cmm"')
+
+
+def measure(runs, cold):
+    session.set_loader(make_loader())
+    pool = session.SessionPool("fake_t32.dll")
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        one_run(pool)
+        if cold:
+            # what run_cmm used to do: LoadLibrary + T32_Init per RUN, T32_Exit after
+            pool.close_all()
+            session.set_loader(make_loader())
+        samples.append(time.perf_counter() - t0)
+    pool.close_all()
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    mean = sum(samples) / len(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(f"{name:<22} mean={mean * 1000:8.2f} ms  p95={p95 * 1000:8.2f} ms")
+    return mean
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    cold = report("connect per request", measure(runs, cold=True))
+    warm = report("pooled session", measure(runs, cold=False))
+    print(f"speedup: {cold / warm:.1f}x")
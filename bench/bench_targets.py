@@ -0,0 +1,51 @@
+# bench_targets.py
+# RUN throughput vs. number of TRACE32 targets, using fake endpoints that
+# share one fake API library through channels.
+# usage: python bench/bench_targets.py [jobs] [script_ms]
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools"), os.path.dirname(os.path.abspath(__file__))]
+
+import CLI
+import history
+from trace32 import session
+from trace32.targets import Target
+from fake_t32 import make_loader
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+CLI.print = _quiet
+
+
+async def run_jobs(n_targets, jobs):
+    targets = [Target(f"fake{i}", "localhost", 20000 + i) for i in range(n_targets)]
+    dispatcher = CLI.Dispatcher(targets=targets, isolation="thread")
+    # connect every target once so the numbers show steady-state scheduling
+    await asyncio.gather(*(dispatcher.submit("CMM", "warmup.cmm", i, want=t.name)
+                           for i, t in enumerate(targets)))
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(dispatcher.submit("CMM", "bench.cmm", i) for i in range(jobs)))
+    elapsed = time.perf_counter() - t0
+    await dispatcher.stop()
+    assert all(r.startswith("PASS") for r in results), results[:3]
+    return elapsed
+
+
+if __name__ == "__main__":
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    script_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+    session.set_loader(make_loader(script_time=script_ms / 1000.0, init_latency=0.01))
+    history.set_history(None)    # keep benchmark runs out of the run history
+    base = None
+    for n in (1, 2, 4, 8):
+        elapsed = asyncio.run(run_jobs(n, jobs))
+        rate = jobs / elapsed
+        base = base or rate
+        print(f"{n} target(s): {rate:7.1f} runs/s  scaling {rate / base:4.2f}x")
@@ -0,0 +1,150 @@
+# bench_transport.py
+# The CLI protocol over loopback TCP vs. the local transport (AF_UNIX here,
+# a named pipe on Windows is not covered): PING round-trip latency, pipelined
+# RUN throughput with an instant fake runner, and READMEM bulk throughput on
+# the zero-latency fake TRACE32 API. The server runs in its own process with
+# both listeners open, so both transports see the same server; the transports
+# take turns for --rounds rounds and the best round of each is shown.
+#
+# usage: python bench/bench_transport.py [--rounds 3] [--pings 10000] [--runs 5000]
+#                                        [--window 16] [--read-mb 16] [--reads 10]
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools"), BENCH]
+
+
+def serve(path):
+    import CLI
+    import fake_t32
+    import history
+
+    history.set_history(None)
+    fake_t32.install(dict(load_latency=0.0, init_latency=0.0, call_latency=0.0))
+    CLI.TOOL_REGISTRY["CMM"] = {"runner": lambda path: "PASS:\nbench", "description": "benchmark runner"}
+
+    async def run():
+        dispatcher = CLI.Dispatcher(isolation="thread")
+        tcp = await CLI.create_server(dispatcher, "127.0.0.1", 0)
+        local = await CLI.create_local_server(dispatcher, path)
+        print(tcp.sockets[0].getsockname()[1], flush=True)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+        dispatcher.start()
+        async with tcp, local:
+            await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def connect(transport, port, path):
+    if transport == "tcp":
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+    sock.sendall(b"PROTO|2\n")
+    f = sock.makefile("rb")
+    f.readline()
+    return sock, f
+
+
+def read_frame(f):
+    kind, req_id, length = f.readline().decode().rstrip("\n").split("|")
+    return kind, req_id, f.read(int(length))
+
+
+def bench_ping(sock, f, n):
+    times = []
+    for i in range(n):
+        start = time.perf_counter()
+        sock.sendall(f"PING|{i}\n".encode())
+        read_frame(f)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99)]
+
+
+def bench_runs(sock, f, n, window, first):
+    # distinct indexes, so the server does not coalesce the runs
+    start = time.perf_counter()
+    sent = done = 0
+    while done < n:
+        burst = []
+        while sent < n and sent - done < window:
+            burst.append(f"RUN|C:\\bench\\t.cmm|{first + sent}\n")
+            sent += 1
+        if burst:
+            sock.sendall("".join(burst).encode())
+        kind, _, body = read_frame(f)
+        if kind in ("PASS", "FAIL", "ERROR"):
+            assert kind == "PASS", body
+            done += 1
+    return n / (time.perf_counter() - start)
+
+
+def bench_read(sock, f, size, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        sock.sendall(f"READMEM|0x20000000|{size}|1\n".encode())
+        kind, _, body = read_frame(f)
+        assert kind == "DATA" and len(body) == size, body[:80]
+        kind, _, body = read_frame(f)
+        assert kind == "PASS", body
+    return size * n / (time.perf_counter() - start) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--pings", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--window", type=int, default=16, help="pipelined RUNs")
+    parser.add_argument("--read-mb", type=float, default=16)
+    parser.add_argument("--reads", type=int, default=10)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve)
+    if not hasattr(socket, "AF_UNIX"):
+        sys.exit("AF_UNIX is not available on this platform")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cli.sock")
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", path],
+                                stdout=subprocess.PIPE, text=True)
+        try:
+            port = int(proc.stdout.readline())
+            size = int(args.read_mb * (1 << 20))
+            best, first = {}, 0
+            for _ in range(args.rounds):
+                for transport in ("tcp", "unix"):
+                    sock, f = connect(transport, port, path)
+                    bench_ping(sock, f, min(args.pings, 1000))          # warm up
+                    p50, p99 = bench_ping(sock, f, args.pings)
+                    runs = bench_runs(sock, f, args.runs, args.window, first)
+                    read = bench_read(sock, f, size, args.reads)
+                    sock.close()
+                    first += args.runs
+                    old = best.get(transport, (p50, p99, runs, read))
+                    best[transport] = (min(old[0], p50), min(old[1], p99), max(old[2], runs), max(old[3], read))
+            print(f"best of {args.rounds} rounds, {os.cpu_count()} CPU(s)")
+            print(f"{'transport':<10}{'PING p50':>11}{'PING p99':>11}{'RUN':>14}{'READMEM':>14}")
+            for transport, (p50, p99, runs, read) in best.items():
+                print(f"{transport:<10}{p50 * 1e6:>8.1f} us{p99 * 1e6:>8.1f} us"
+                      f"{runs:>8.0f} req/s{read:>9.0f} MB/s")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
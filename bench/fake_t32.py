@@ -0,0 +1,236 @@
+# fake_t32.py
+# Pure-Python stand-in for the parts of t32api64.dll used by the runners.
+# Lets the server and the benchmarks run without a debugger attached.
+# Each API channel (T32_GetChannelDefaults/T32_SetChannel) behaves like a
+# separate TRACE32 instance, so several fake targets can share one "DLL".
+#
+# Behaviour is configurable: per-call latencies, what a DO script prints
+# (FakeScript) and injected failures (T32_Init refusals, T32_Cmd errors,
+# dropped connections).
+import itertools
+import os
+import random
+import re
+import time
+import zlib
+
+_RANGE = re.compile(rb"0x([0-9A-Fa-f]+)--0x([0-9A-Fa-f]+)")
+_DO = re.compile(rb'DO\s+"?([^"]*)"?')
+PAGE = 0x10000
+
+
+class FakeScript:
+    """
+    What `DO <script>` does on the fake: it runs for `duration` seconds and
+    shows `lines` on the message line one after another, evenly spread over
+    the run. `status` is the T32_GetMessage status reported with each line.
+    """
+
+    def __init__(self, duration=0.0, lines=(), status=0):
+        self.duration = duration
+        self.lines = list(lines)
+        self.status = status
+
+    @classmethod
+    def steps(cls, duration, count, fail_at=None):
+        lines = [f"Step {i}/{count} ok" for i in range(1, count + 1)]
+        if fail_at:
+            lines[fail_at - 1] = f"Step {fail_at}/{count} TestStepFail"
+        return cls(duration, lines)
+
+
+class _Instance:
+    def __init__(self):
+        self.node = b""
+        self.port = b""
+        self.connected = False
+        self.init_failures = 0
+        self.script = None
+        self.script_start = 0.0
+        self.script_end = 0.0
+        self.pages = {}          # sparse target memory, erased state 0xFF
+        self.eval = 0
+
+    def message(self, now):
+        # (text, status) currently on the message line
+        script = self.script
+        if script is None or not script.lines:
+            return "", 0
+        if script.duration <= 0 or now >= self.script_end:
+            return script.lines[-1], script.status
+        i = int((now - self.script_start) / script.duration * len(script.lines))
+        return script.lines[min(i, len(script.lines) - 1)], script.status
+
+    def read(self, address, size):
+        out = bytearray()
+        while size:
+            page, off = divmod(address, PAGE)
+            n = min(size, PAGE - off)
+            data = self.pages.get(page)
+            out += data[off:off + n] if data else b"\xff" * n
+            address, size = address + n, size - n
+        return out
+
+    def write(self, address, data):
+        data = memoryview(data)
+        while data:
+            page, off = divmod(address, PAGE)
+            n = min(len(data), PAGE - off)
+            self.pages.setdefault(page, bytearray(b"\xff" * PAGE))[off:off + n] = data[:n]
+            address, data = address + n, data[n:]
+
+
+class FakeT32Api:
+    """
+    init_latency    seconds per T32_Init
+    call_latency    seconds per other API call, unless overridden in `latencies`
+    latencies       {"T32_Cmd": 0.002, ...} per-function latencies
+    script_time     duration of scripts not listed in `scripts`
+    messages        lines printed by such scripts ("Step i/N ok")
+    scripts         {"name.cmm": FakeScript(...)} by file name
+    init_failures   T32_Init calls refused per instance before it connects
+    cmd_error_rate  probability that T32_Cmd returns an error
+    drop_rate       probability per call that the connection drops
+    """
+
+    def __init__(self, init_latency=0.05, call_latency=0.0005, script_time=0.0, latencies=None,
+                 messages=0, scripts=None, init_failures=0, cmd_error_rate=0.0, drop_rate=0.0,
+                 seed=None):
+        self.init_latency = init_latency
+        self.call_latency = call_latency
+        self.latencies = dict(latencies or {})
+        self.script_time = script_time
+        self.messages = messages
+        self.scripts = dict(scripts or {})
+        self.init_failures = init_failures
+        self.cmd_error_rate = cmd_error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._instances = {}
+        self._current = _Instance()
+
+    def _call(self, name):
+        self.calls += 1
+        latency = self.latencies.get(name, self.call_latency)
+        if latency:
+            time.sleep(latency)
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self._current.connected = False
+        return 0 if self._current.connected else -1
+
+    def script_for(self, path):
+        name = os.path.basename(path.replace("\\", "/"))
+        script = self.scripts.get(name)
+        if script is None:
+            script = FakeScript.steps(self.script_time, self.messages)
+        return script
+
+    # channels
+    def T32_GetChannelSize(self):
+        return 16
+
+    def T32_GetChannelDefaults(self, channel):
+        channel.value = b"ch%d" % next(self._ids)
+
+    def T32_SetChannel(self, channel):
+        self._current = self._instances.setdefault(channel.value, _Instance())
+
+    # connection
+    def T32_Config(self, key, value):
+        if key == b"NODE=":
+            self._current.node = value
+        elif key == b"PORT=":
+            self._current.port = value
+        return 0
+
+    def T32_Init(self):
+        time.sleep(self.latencies.get("T32_Init", self.init_latency))
+        instance = self._current
+        if instance.init_failures < self.init_failures:
+            instance.init_failures += 1
+            return -1
+        instance.connected = True
+        return 0
+
+    def T32_Attach(self, device):
+        return self._call("T32_Attach")
+
+    def T32_Ping(self):
+        return self._call("T32_Ping")
+
+    def T32_Exit(self):
+        self._current.connected = False
+        return 0
+
+    # practice
+    def T32_Cmd(self, cmd):
+        rc = self._call("T32_Cmd")
+        if rc != 0:
+            return rc
+        if self.cmd_error_rate and self.random.random() < self.cmd_error_rate:
+            return -2
+        instance = self._current
+        if cmd.startswith(b"DO "):
+            m = _DO.match(cmd)
+            instance.script = self.script_for(m.group(1).decode(errors="ignore") if m else "")
+            instance.script_start = time.monotonic()
+            instance.script_end = instance.script_start + instance.script.duration
+        elif cmd == b"PRINT":
+            instance.script = None          # clears the message line
+        m = _RANGE.search(cmd)
+        if m:
+            start, end = int(m.group(1), 16), int(m.group(2), 16)
+            if cmd.startswith(b"FLASH.Erase"):
+                instance.write(start, b"\xff" * (end - start + 1))
+            elif cmd.startswith(b"Data.SUM"):
+                instance.eval = zlib.crc32(instance.read(start, end - start + 1))
+        return 0
+
+    def T32_Stop(self):
+        self._current.script_end = 0.0
+        return self._call("T32_Stop")
+
+    def T32_EvalGet(self, value_ref):
+        value_ref._obj.value = self._current.eval
+        return self._call("T32_EvalGet")
+
+    # memory
+    def T32_ReadMemory(self, address, access, buffer, size):
+        memoryview(buffer).cast("B")[:size] = self._current.read(getattr(address, "value", address), size)
+        return self._call("T32_ReadMemory")
+
+    def T32_WriteMemory(self, address, access, buffer, size):
+        self._current.write(getattr(address, "value", address), bytes(buffer)[:size])
+        return self._call("T32_WriteMemory")
+
+    def T32_GetPracticeState(self, state_ref):
+        state_ref._obj.value = 1 if time.monotonic() < self._current.script_end else 0
+        return self._call("T32_GetPracticeState")
+
+    def T32_GetMessage(self, buffer, status_ref):
+        text, status = self._current.message(time.monotonic())
+        buffer.value = text.encode()[:len(buffer) - 1]
+        status_ref._obj.value = status
+        return self._call("T32_GetMessage")
+
+
+def make_loader(load_latency=0.02, **kwargs):
+    """
+    Return a loader for trace32.session.set_loader() that builds a
+    FakeT32Api (keyword arguments as above) and simulates the DLL load cost.
+    """
+    def loader(dll_path):
+        time.sleep(load_latency)
+        return FakeT32Api(**kwargs)
+    return loader
+
+
+def install(options):
+    """
+    Make trace32.session use the fake API with `options` (make_loader()
+    keywords). Usable as a WorkerPool initializer: (install, (options,)).
+    """
+    from trace32 import session
+    session.set_loader(make_loader(**options))
@@ -0,0 +1,247 @@
+# history.py
+# Persistent run history in SQLite. Runner threads hand finished runs to
+# RunHistory.record(), which only queues them; a background writer thread
+# inserts them in batches, so recording never blocks a request. Queries
+# use indexes on (script|verdict, started) and (script, verdict, started),
+# so a filter on both plus a time window is answered from one index, and
+# page with a keyset cursor instead of OFFSET, so they stay fast with
+# millions of rows.
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+QUEUE_SIZE  = 10000   # runs waiting for the writer; beyond that runs are dropped
+BATCH_SIZE  = 500
+PAGE_SIZE   = 50
+MAX_PAGE    = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id       INTEGER PRIMARY KEY,
+    started  REAL NOT NULL,
+    duration REAL NOT NULL,
+    script   TEXT NOT NULL,          -- lowercased file name, for filtering
+    path     TEXT NOT NULL,
+    tool     TEXT NOT NULL,
+    idx      INTEGER,
+    target   TEXT,
+    verdict  TEXT NOT NULL,
+    phases   TEXT,                   -- JSON {phase: seconds}
+    log      TEXT                    -- spilled run log, if any
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS runs_script  ON runs (script, started);
+CREATE INDEX IF NOT EXISTS runs_verdict ON runs (verdict, started);
+CREATE INDEX IF NOT EXISTS runs_script_verdict ON runs (script, verdict, started);
+"""
+
+COLUMNS = ("id", "started", "duration", "verdict", "tool", "target", "idx", "path", "phases", "log")
+
+_TIMINGS = re.compile(r"^Timings: (.*)$", re.MULTILINE)
+_PHASE   = re.compile(r"(\w+)=(\d+)ms")
+_LOG_REF = re.compile(r"full log: (.+?)\]?$", re.MULTILINE | re.IGNORECASE)
+
+
+def parse_phases(result):
+    """{phase: seconds} from the last "Timings:" line of a runner result."""
+    lines = _TIMINGS.findall(result)
+    if not lines:
+        return {}
+    return {name: int(ms) / 1000 for name, ms in _PHASE.findall(lines[-1]) if name != "total"}
+
+
+def parse_log_ref(result):
+    m = _LOG_REF.search(result)
+    return m.group(1).strip() if m else None
+
+
+def parse_time(text):
+    """Epoch seconds, or an ISO date/time in local time ("2024-05-01", "2024-05-01T10:30")."""
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"ERROR: Invalid time '{text}'")
+
+
+def _connect(path):
+    db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class RunHistory:
+    def __init__(self, path):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(QUEUE_SIZE)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with _connect(path) as db:
+            db.executescript(SCHEMA)
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, started, duration, path, tool, index, target, result):
+        phases = parse_phases(result)
+        row = (
+            started, duration, os.path.basename(path.replace("\\", "/")).lower(), path, tool,
+            index, target, "PASS" if result.startswith("PASS") else "FAIL",
+            json.dumps(phases) if phases else None, parse_log_ref(result),
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                print(f"[PYTHON] History writer behind, {self.dropped} run(s) not recorded")
+
+    def _write_loop(self):
+        db = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]    # None: close()
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO runs (started, duration, script, path, tool, idx, target,"
+                        " verdict, phases, log) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+            except sqlite3.Error as e:
+                print(f"[PYTHON] History write failed ({len(rows)} run(s)): {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if len(rows) < len(batch):
+                db.close()
+                return
+
+    def flush(self):
+        """Wait until every queued run is written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+
+    def query(self, script=None, verdict=None, since=None, until=None, before=None, limit=PAGE_SIZE):
+        """
+        Newest runs first, as (rows, next_cursor). Pass next_cursor back as
+        `before` for the following page; it is None on the last page.
+        """
+        where, args = [], []
+        if script:
+            where.append("script = ?")
+            args.append(os.path.basename(script.replace("\\", "/")).lower())
+        if verdict:
+            where.append("verdict = ?")
+            args.append(verdict.upper())
+        if since is not None:
+            where.append("started >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("started < ?")
+            args.append(until)
+        if before is not None:
+            where.append("(started, id) < (SELECT started, id FROM runs WHERE id = ?)")
+            args.append(before)
+        limit = max(1, min(limit, MAX_PAGE))
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM runs"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY started DESC, id DESC LIMIT ?")
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = _connect(self.path)
+            rows = self._reader.execute(sql, args + [limit + 1]).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, (rows[-1][0] if more else None)
+
+
+def format_rows(rows, next_cursor):
+    """Tab-separated rows with a header line, and "next=<cursor>" when there are more."""
+    lines = ["\t".join(COLUMNS)]
+    for row in rows:
+        id_, started, duration, verdict, tool, target, idx, path, phases, log = row
+        stamp = datetime.fromtimestamp(started).isoformat(timespec="seconds")
+        lines.append("\t".join(str(v) for v in (
+            id_, stamp, f"{duration:.3f}", verdict, tool, target or "", idx, path, phases or "", log or ""
+        )))
+    if next_cursor is not None:
+        lines.append(f"next={next_cursor}")
+    return "\n".join(lines)
+
+
+def history_id(msg):
+    """The request ID of a HISTORY command: its last field without '=', as sent."""
+    ids = [f.strip() for f in msg.split("|")[1:] if "=" not in f and f.strip()]
+    return ids[-1] if ids else "0"
+
+
+def parse_history(msg):
+    """
+    Parse 'HISTORY[|key=value...][|ID]' into (filters, req_id). Keys: script,
+    verdict, since, until (epoch or ISO time), limit, before (paging cursor).
+    A field without '=' is the request ID.
+    """
+    filters = {}
+    for field in msg.split("|")[1:]:
+        key, sep, value = field.partition("=")
+        if not sep:
+            continue
+        key, value = key.strip().lower(), value.strip()
+        if key in ("script", "verdict"):
+            filters[key] = value
+        elif key in ("since", "until"):
+            filters[key] = parse_time(value)
+        elif key in ("limit", "before"):
+            if not value.isdigit():
+                raise ValueError(f"ERROR: Invalid {key} '{value}'")
+            filters[key] = int(value)
+        else:
+            raise ValueError(f"ERROR: Unknown HISTORY filter '{key}'")
+    if filters.get("verdict", "PASS").upper() not in ("PASS", "FAIL"):
+        raise ValueError("ERROR: verdict must be PASS or FAIL")
+    return filters, history_id(msg)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def set_history(store):
+    """Replace the process-wide RunHistory; None turns recording off (e.g. for benchmarks)."""
+    global _history
+    with _history_lock:
+        _history = store or False
+
+
+def get_history(path):
+    """Process-wide RunHistory for `path` (opened on first use); None if `path` is empty."""
+    global _history
+    if not path:
+        return None
+    with _history_lock:
+        if _history is None:
+            try:
+                _history = RunHistory(path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"[PYTHON] Run history disabled, cannot open {path}: {e}")
+                _history = False
+        return _history or None
@@ -5,7 +5,7 @@ import configparser
 import tkinter as tk
 from tkinter import messagebox
 from auto_config import ConfigWizard, CONFIG_PATH, get_app_folder
-import trace32_launcher  
+import trace32_launcher
 CONFIG_DONE_FLAG = os.path.join(get_app_folder(), ".config_done")
 REQUIRED_PATHS = [
     ("paths", "trace32_exe"),
@@ -89,16 +89,23 @@ def main():
         print("[Launcher] Configuration invalid or incomplete. Exiting.")
         return
 
-    print("[Launcher] Configuration OK. Launching CANoe.")
+    # TRACE32 boots in the background while CANoe opens; only then wait for its API
+    print("[Launcher] Configuration OK. Launching TRACE32 and CANoe.")
+    t32_proc = None
+    try:
+        t32_proc = trace32_launcher.launch_trace32(wait=False)
+    except Exception as e:
+        show_error("TRACE32 Error", f"Failed to start TRACE32:\n{e}")
+        return
     launch_canoe()
 
     try:
-        print("[Launcher] Launching TRACE32...")
-        t32_proc = trace32_launcher.launch_trace32()
-        trace32_launcher.init_api()
-        print("[Launcher] TRACE32 launched successfully.")
+        waited = trace32_launcher.wait_ready(t32_proc)
+        print(f"[Launcher] TRACE32 ready after {waited:.1f}s.")
     except Exception as e:
         show_error("TRACE32 Error", f"Failed to start TRACE32:\n{e}")
+        return
+    # with standby_port set, the server starts and watches the standby (CLI.start_standby)
 
 if __name__ == "__main__":
     main()
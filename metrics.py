@@ -0,0 +1,224 @@
+# metrics.py
+# In-process counters, gauges and latency histograms for the server and the
+# runners. Recording is a dict lookup and a few integer updates under a
+# per-metric lock; all formatting happens only when someone asks (STATS
+# command or the Prometheus endpoint), so unread metrics cost next to nothing.
+import bisect
+import threading
+
+# upper bounds in seconds; +Inf is implicit
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+HELP = {
+    "t32_phase_seconds":          "Duration of one runner phase",
+    "t32_run_seconds":            "Duration of a whole run (runner call)",
+    "t32_queue_wait_seconds":     "Time a request waited for a free target",
+    "t32_session_seconds":        "TRACE32 API session steps (DLL load, init, attach)",
+    "t32_requests_total":         "Commands received",
+    "t32_errors_total":           "Failed runs and rejected commands",
+    "t32_session_retries_total":  "T32_Init/T32_Attach attempts that had to be retried",
+    "t32_reconnects_total":       "Sessions that failed their health check and reconnected",
+    "t32_coalesced_total":        "RUNs answered by a running identical request or the result cache",
+    "t32_cancels_total":          "Requests cancelled by CANCEL or because the client went away",
+    "t32_suite_tests_total":      "RUNSUITE tests by verdict (PASS, FAIL, SKIP)",
+    "t32_memory_seconds":         "READMEM/WRITEMEM transfer time on the target",
+    "t32_memory_bytes_total":     "Bytes read or written by READMEM/WRITEMEM",
+    "t32_worker_restarts_total":  "Runner worker processes killed or replaced (deadline, crash)",
+    "t32_connections_total":      "Client connections accepted",
+    "t32_connections_active":     "Client connections currently open",
+    "t32_jobs_waiting":           "Requests waiting for a target",
+    "t32_jobs_running":           "Requests running on a target",
+}
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+    def quantile(self, q, counts=None, count=None):
+        """Upper bucket bound holding the q-quantile (q in 0..1); inf beyond the last bucket."""
+        if counts is None:
+            counts, count, _ = self.snapshot()
+        if not count:
+            return 0.0
+        rank, seen = q * count, 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}       # (name, labels) -> metric
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.setdefault(key, cls())
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self._get(Histogram, name, labels)
+
+    def export(self, reset=True):
+        """
+        Counter and histogram values as plain tuples (e.g. to send from a
+        worker process to the server), optionally resetting them.
+        """
+        items = []
+        with self._lock:
+            metrics = list(self.metrics.items())
+        for (name, labels), metric in metrics:
+            if metric.kind == "gauge":
+                continue
+            with metric._lock:
+                if metric.kind == "counter":
+                    if metric.value:
+                        items.append((name, labels, metric.value))
+                    if reset:
+                        metric.value = 0
+                elif metric.count:
+                    items.append((name, labels, (list(metric.counts), metric.count, metric.sum)))
+                    if reset:
+                        metric.counts = [0] * len(metric.counts)
+                        metric.count, metric.sum = 0, 0.0
+        return items
+
+    def merge(self, items):
+        """Add values produced by export() to this registry."""
+        for name, labels, value in items:
+            labels = dict(labels)
+            if isinstance(value, tuple):
+                metric = self.histogram(name, **labels)
+                counts, count, total = value
+                with metric._lock:
+                    metric.counts = [a + b for a, b in zip(metric.counts, counts)]
+                    metric.count += count
+                    metric.sum += total
+            else:
+                self.counter(name, **labels).inc(value)
+
+    def _sorted(self):
+        with self._lock:
+            return sorted(self.metrics.items(), key=lambda item: item[0])
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines, declared = [], set()
+        for (name, labels), metric in self._sorted():
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {metric.value}")
+                continue
+            counts, count, total = metric.snapshot()
+            cumulative = 0
+            for bound, n in zip(metric.bounds + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def render_text(self, prefix=""):
+        """Human-readable summary for the STATS command, optionally for names starting with `prefix`."""
+        lines = []
+        for (name, labels), metric in self._sorted():
+            if not name.startswith(prefix):
+                continue
+            label = name + _labels(labels)
+            if metric.kind != "histogram":
+                lines.append(f"{label} {metric.value}")
+                continue
+            counts, count, total = metric.snapshot()
+            if not count:
+                continue
+            p50, p95, p99 = (_fmt(metric.quantile(q, counts, count)) for q in (0.5, 0.95, 0.99))
+            lines.append(f"{label} count={count} mean={total / count:.3f}s "
+                         f"p50<={p50} p95<={p95} p99<={p99}")
+        return "\n".join(lines)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + body + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(bound):
+    return "inf" if bound == float("inf") else f"{bound:g}s"
+
+
+METRICS = Registry()
+
+
+def observe(name, seconds, **labels):
+    METRICS.histogram(name, **labels).observe(seconds)
+
+
+def count(name, amount=1, **labels):
+    METRICS.counter(name, **labels).inc(amount)
+
+
+def gauge(name, **labels):
+    return METRICS.gauge(name, **labels)
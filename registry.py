@@ -1,16 +1,94 @@
 # registry.py
-from trace32.run_cmm import run_cmm
+# Runner modules are imported on first use, so starting the server does not
+# load ctypes wrappers or tool code that a bench never calls.
+import importlib
+import sys
+import threading
 
-from vflash.run_vflash import run_vflash
+from app_paths import TOOLS_DIR
 
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+
+class LazyRunner:
+    def __init__(self, module, function):
+        self.module = module
+        self.function = function
+        self._runner = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"LazyRunner({self.module}.{self.function})"
+
+    @property
+    def loaded(self):
+        return self._runner is not None
+
+    def __call__(self, *args, **kwargs):
+        if self._runner is None:
+            with self._lock:
+                if self._runner is None:
+                    print(f"[PYTHON] Loading runner {self.module}.{self.function}")
+                    self._runner = getattr(importlib.import_module(self.module), self.function)
+        return self._runner(*args, **kwargs)
+
+
+# "streaming": runner accepts on_message= and reports TRACE32 messages live
+# "targeted":  runner accepts target= (a trace32.targets.Target) to run on
+# "timed":     runner accepts timeout= (seconds) instead of [runtime] timeout
+# "cancellable": runner accepts cancel= (an Event) and stops soon after it is set
+# "flash":     runner programs flash; a cancel is never enforced by killing its
+#              worker, it stops at the next sector/block boundary
 TOOL_REGISTRY = {
     "TRACE32": {
-        "runner": run_cmm,
-        "description": "Execute TRACE32 CMM script"
+        "runner": LazyRunner("trace32.run_cmm", "run_cmm"),
+        "description": "Execute TRACE32 CMM script",
+        "streaming": True,
+        "targeted": True,
+        "timed": True,
+        "cancellable": True
+    },
+
+    "CFLASH": {
+        "runner": LazyRunner("trace32.delta_flash", "run_cflash"),
+        "description": "Delta-flash a binary image (changed sectors only)",
+        "streaming": True,
+        "targeted": True,
+        "cancellable": True,
+        "flash": True
+    },
+
+    "HEX_TOOL": {
+        "runner": LazyRunner("trace32.hex_loader", "run_hex"),
+        "description": "Download an Intel HEX / S-record image",
+        "streaming": True,
+        "targeted": True,
+        "cancellable": True,
+        "flash": True
     },
 
     "VFLASH": {
-        "runner": run_vflash,
-        "description": "Execute vFlash project"
+        "runner": LazyRunner("vflash.run_vflash", "run_vflash"),
+        "description": "Execute vFlash project",
+        "flash": True
     }
-}
\ No newline at end of file
+}
+
+# Name used by CLI.detect_tool for *.cmm paths
+TOOL_REGISTRY["CMM"] = TOOL_REGISTRY["TRACE32"]
+
+
+def call_runner(tool, path, on_message=None, target=None, timeout=None, cancel=None):
+    """Run `tool` on `path`, passing on_message/target/timeout/cancel to runners that take them."""
+    entry = TOOL_REGISTRY[tool]
+    kwargs = {}
+    if on_message and entry.get("streaming"):
+        kwargs["on_message"] = on_message
+    if target and entry.get("targeted"):
+        kwargs["target"] = target
+    if timeout and entry.get("timed"):
+        kwargs["timeout"] = timeout
+    if cancel is not None and entry.get("cancellable"):
+        kwargs["cancel"] = cancel
+    return entry["runner"](path, **kwargs).rstrip()   # "PASS: ..." or "FAIL: ..."
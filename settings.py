@@ -0,0 +1,176 @@
+# settings.py
+# One typed, validated view of config.ini shared by the server and the tools.
+# get_settings() re-reads the file when its mtime changes and swaps in the new
+# snapshot in one step. Code handling a request takes a single snapshot and
+# uses it throughout, so a reload never mixes old and new values in one run;
+# the next request simply sees the new settings.
+import configparser
+import os
+import sys
+import threading
+import time
+
+from app_paths import APP_DIR, CONFIG_PATH
+
+RELOAD_CHECK_INTERVAL = 1.0   # seconds between mtime checks
+
+
+def _int(cfg, section, key, default, minimum=None, maximum=None):
+    raw = cfg.get(section, key, fallback=str(default)).strip()
+    try:
+        value = int(raw, 0)
+    except ValueError:
+        raise ValueError(f"[{section}] {key}: '{raw}' is not an integer")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f"[{section}] {key}: {value} is out of range")
+    return value
+
+
+def _float(cfg, section, key, default, minimum=0.0):
+    raw = cfg.get(section, key, fallback=str(default)).strip()
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"[{section}] {key}: '{raw}' is not a number")
+    if value < minimum:
+        raise ValueError(f"[{section}] {key}: {value} is out of range")
+    return value
+
+
+def _choice(cfg, section, key, default, choices):
+    value = cfg.get(section, key, fallback=default).strip().lower()
+    if value not in choices:
+        raise ValueError(f"[{section}] {key}: '{value}' is not one of {', '.join(choices)}")
+    return value
+
+
+class Settings:
+    """Immutable snapshot of config.ini ([paths], [runtime], [flash], [targets])."""
+
+    def __init__(self, cfg, mtime=None, generation=0):
+        self.mtime = mtime
+        self.generation = generation
+
+        # [paths]
+        self.trace32_exe    = cfg.get("paths", "trace32_exe", fallback=os.path.join(APP_DIR, "bin", "t32marm.exe"))
+        self.trace32_config = cfg.get("paths", "trace32_config", fallback=os.path.join(APP_DIR, "dll", "config.t32"))
+        self.trace32_dll    = cfg.get("paths", "trace32_dll", fallback=os.path.join(APP_DIR, "dll", "t32api64.dll"))
+        self.canoe_cfg      = cfg.get("paths", "canoe_cfg", fallback="")
+        self.trace32_standby_config = cfg.get("paths", "trace32_standby_config", fallback="")
+        self.tmp_dir        = os.path.join(APP_DIR, cfg.get("paths", "tmp_dir", fallback="tmp"))
+        self.cli            = cfg.get("paths", "cli", fallback=os.path.join(APP_DIR, "CLI.py"))
+        history_db          = cfg.get("paths", "history_db", fallback="history.db").strip()
+        self.history_db     = os.path.join(APP_DIR, history_db) if history_db else ""   # "": off
+
+        # [runtime] (cli_host/cli_port/backlog/transport/local_socket only apply on server start)
+        self.cli_host           = cfg.get("runtime", "cli_host", fallback="127.0.0.1")
+        self.cli_port           = _int(cfg, "runtime", "cli_port", 12345, 1, 65535)
+        self.backlog            = _int(cfg, "runtime", "backlog", 256, 1)
+        self.queue_limit        = _int(cfg, "runtime", "queue_limit", 1000, 0)    # 0: unbounded
+        self.transport          = _choice(cfg, "runtime", "transport", "tcp", ("tcp", "local", "both"))
+        self.local_socket       = cfg.get("runtime", "local_socket", fallback="").strip() or (
+            r"\\.\pipe\trace32_cli" if sys.platform == "win32" else os.path.join(self.tmp_dir, "cli.sock"))
+        self.workers            = _int(cfg, "runtime", "workers", 0, 0)
+        self.trace32_node       = cfg.get("runtime", "trace32_node", fallback="localhost")
+        self.trace32_port       = str(_int(cfg, "runtime", "trace32_port", 20000, 1, 65535))
+        self.trace32_packlen    = str(_int(cfg, "runtime", "trace32_packlen", 1024, 64))
+        self.timeout            = _float(cfg, "runtime", "timeout", 20)
+        self.inactivity_timeout = _float(cfg, "runtime", "inactivity_timeout", 5)
+        self.timeout_factor     = _float(cfg, "runtime", "timeout_factor", 3)     # 0: always [runtime] timeout
+        self.timeout_min        = _float(cfg, "runtime", "timeout_min", 5)
+        self.timeout_max        = _float(cfg, "runtime", "timeout_max", 600)
+        self.timeout_runs       = _int(cfg, "runtime", "timeout_runs", 5, 1)       # passing runs before adapting
+        self.timeout_window     = _int(cfg, "runtime", "timeout_window", 50, 1)    # recent runs in the profile
+        if self.timeout_min > self.timeout_max:
+            raise ValueError(f"[runtime] timeout_min: {self.timeout_min:g} is above timeout_max")
+        self.completion_mode    = _choice(cfg, "runtime", "completion_mode", "idle", ("idle", "inactivity"))
+        self.isolation          = _choice(cfg, "runtime", "isolation", "process", ("process", "thread"))
+        self.job_deadline       = _float(cfg, "runtime", "job_deadline", 0)   # 0: timeout + inactivity + 30s
+        self.result_cache_seconds = _float(cfg, "runtime", "result_cache_seconds", 10)   # v2 PASS results; 0: off
+        self.launch_timeout     = _float(cfg, "runtime", "launch_timeout", 30)
+        self.standby_port       = _int(cfg, "runtime", "standby_port", 0, 0, 65535)   # 0: no standby
+        self.metrics_host       = cfg.get("runtime", "metrics_host", fallback=self.cli_host)
+        self.metrics_port       = _int(cfg, "runtime", "metrics_port", 0, 0, 65535)   # 0: off
+        self.log_tail_lines     = _int(cfg, "runtime", "log_tail_lines", 200, 1)
+        self.log_keep           = _int(cfg, "runtime", "log_keep", 50, 1)
+
+        # [flash]
+        self.flash_setup_script = cfg.get("flash", "setup_script", fallback="")
+        self.flash_base_address = _int(cfg, "flash", "base_address", 0, 0)
+        self.flash_sector_size  = _int(cfg, "flash", "sector_size", 0x1000, 1)
+        self.flash_checksum     = _choice(cfg, "flash", "checksum", "readback", ("readback", "target"))
+
+        # [targets] name = node:port[:packlen] [capabilities...], see trace32/targets.py
+        self.targets = dict(cfg.items("targets")) if cfg.has_section("targets") else {}
+
+        # [rules] name = severity: regex, see trace32/rules.py (raw: regexes may contain %)
+        self.rules = dict(cfg.items("rules", raw=True)) if cfg.has_section("rules") else {}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_settings(path=CONFIG_PATH, generation=0):
+    """Read and validate `path`; raises ValueError on invalid values."""
+    cfg = configparser.ConfigParser()
+    mtime = _mtime(path)
+    cfg.read(path)
+    return Settings(cfg, mtime, generation)
+
+
+_current = None
+_rejected_mtime = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def get_settings():
+    """
+    Current settings snapshot. The file is checked at most once per
+    RELOAD_CHECK_INTERVAL; an invalid edit is reported and the previous
+    snapshot stays in effect.
+    """
+    global _current, _rejected_mtime, _last_check
+    now = time.monotonic()
+    current = _current
+    if current is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return current
+
+    with _lock:
+        _last_check = now
+        mtime = _mtime(CONFIG_PATH)
+        if _current is not None and mtime in (_current.mtime, _rejected_mtime):
+            return _current
+        generation = _current.generation + 1 if _current else 0
+        try:
+            new = load_settings(CONFIG_PATH, generation)
+        except ValueError as e:
+            if _current is None:
+                raise
+            _rejected_mtime = mtime
+            print(f"[CONFIG] Ignoring invalid config.ini change: {e}")
+            return _current
+        if _current is not None:
+            print(f"[CONFIG] Reloaded {CONFIG_PATH}")
+        _current = new
+        return _current
+
+
+def update_setting(section, key, value, path=CONFIG_PATH):
+    """
+    Write one value to config.ini (replacing the file in one step). Running
+    processes pick it up through hot reload.
+    """
+    cfg = configparser.ConfigParser(interpolation=None)    # keep [rules] regexes as written
+    cfg.read(path)
+    if not cfg.has_section(section):
+        cfg.add_section(section)
+    cfg.set(section, key, str(value))
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        cfg.write(f)
+    os.replace(tmp, path)
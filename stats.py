@@ -0,0 +1,32 @@
+# stats.py
+# Small helpers for run duration statistics.
+import math
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0..100) of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(q / 100.0 * len(values)) - 1))
+    return values[rank]
+
+
+def summarize(durations):
+    values = sorted(durations)
+    if not values:
+        return {"count": 0, "min": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "min":   values[0],
+        "mean":  sum(values) / len(values),
+        "p50":   percentile(values, 50),
+        "p95":   percentile(values, 95),
+        "p99":   percentile(values, 99),
+        "max":   values[-1],
+    }
+
+
+def format_durations(durations):
+    s = summarize(durations)
+    return (f"min={s['min']:.3f}s mean={s['mean']:.3f}s "
+            f"p95={s['p95']:.3f}s max={s['max']:.3f}s")
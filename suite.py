@@ -0,0 +1,293 @@
+# suite.py
+# RUNSUITE: a manifest of scripts run as one suite. The manifest is an INI
+# file with an optional [suite] section and one section per test:
+#
+#   [suite]
+#   name = nightly
+#   output = reports            ; default <tmp_dir>/suites
+#   stop_on_fail = no           ; yes: skip the tests not yet started after a failure
+#
+#   [DEFAULT]
+#   timeout = 30                ; applies to every test unless it sets its own
+#
+#   [flash_app]
+#   path = images\app.hex       ; relative to the manifest
+#   target = flash              ; target name or capability, like RUN's TARGET
+#   tags = flash nightly
+#   timeout = 120               ; script timeout in seconds ([runtime] timeout)
+#
+#   [smoke_can]
+#   path = C:\tests\smoke_can.cmm
+#   after = flash_app           ; starts once these tests passed
+#
+# Every test whose dependencies passed is started at once; the dispatcher
+# runs them in parallel across the free targets. A test is skipped when one
+# of its dependencies failed or was skipped. The result is written as JUnit
+# XML and as a CANoe test module (the shape of canoe/test.xml) carrying the
+# verdict of each test.
+import asyncio
+import configparser
+import os
+import re
+import socket
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+SUITE_SECTION = "suite"
+CANOE_NS      = "http://www.vector-informatik.de/CANoe/TestModule/1.16"
+CAPL_FUNCTION = "TF_SuiteResult"     # CAPL test function (canoe/tf.can) the CANoe test module calls per test
+
+
+def _words(value):
+    return [word for word in value.replace(",", " ").split() if word]
+
+
+def _flag(value):
+    return value.strip().lower() in ("1", "yes", "true", "on")
+
+
+class SuiteTest:
+    def __init__(self, name, path, index, target="", tags=(), after=(), timeout=None):
+        self.name = name
+        self.path = path
+        self.tool = ""                  # set by the server (CLI.detect_tool)
+        self.index = index              # position in the manifest; the request ID of its run
+        self.target = target
+        self.tags = set(tags)
+        self.after = list(after)
+        self.timeout = timeout
+        self.verdict = ""               # PASS, FAIL or SKIP once finished
+        self.result = ""
+        self.seconds = 0.0
+        self.ran_on = ""
+
+    def line(self):
+        line = f"{self.name} {self.verdict} {self.seconds:.3f}s"
+        if self.ran_on:
+            line += f" on {self.ran_on}"
+        if self.verdict != "PASS":
+            line += "\n" + self.result
+        return line
+
+
+class Suite:
+    def __init__(self, name, manifest, tests, output, stop_on_fail=False):
+        self.name = name
+        self.manifest = manifest
+        self.tests = tests
+        self.by_name = {t.name: t for t in tests}
+        self.output = output
+        self.stop_on_fail = stop_on_fail
+        self.started = 0.0
+        self.seconds = 0.0
+
+    def counts(self):
+        verdicts = [t.verdict for t in self.tests]
+        return verdicts.count("PASS"), verdicts.count("FAIL"), verdicts.count("SKIP")
+
+    def summary(self):
+        passed, failed, skipped = self.counts()
+        verdict = "PASS" if passed == len(self.tests) else "FAIL"
+        return (f"{verdict}: {self.name}: {passed}/{len(self.tests)} passed, {failed} failed, "
+                f"{skipped} skipped in {self.seconds:.1f}s")
+
+
+def parse_suite(msg):
+    """Parse 'RUNSUITE|MANIFEST[|ID[|TAGS]]' into (manifest, req_id, tags)."""
+    parts = msg.split("|") + [""] * 2
+    manifest = parts[1].strip()
+    if not manifest:
+        raise ValueError("ERROR: RUNSUITE needs a manifest path")
+    return manifest, parts[2].strip() or "0", _words(parts[3])
+
+
+def load_manifest(path, tags=(), default_output="suites"):
+    """
+    Read a suite manifest. With `tags`, only the tests carrying one of them
+    run, plus the tests they depend on. Raises ValueError with the error
+    reply for the client.
+    """
+    cfg = configparser.ConfigParser(interpolation=None)
+    try:
+        if not cfg.read(path, encoding="utf-8"):
+            raise ValueError(f"ERROR: Cannot read manifest {path}")
+    except configparser.Error as e:
+        raise ValueError(f"ERROR: Invalid manifest {path}: {e}".replace("\n", " "))
+    base = os.path.dirname(os.path.abspath(path))
+    info = cfg[SUITE_SECTION] if cfg.has_section(SUITE_SECTION) else {}
+    name = info.get("name", "").strip() or os.path.splitext(os.path.basename(path))[0]
+
+    tests = []
+    for section in cfg.sections():
+        if section == SUITE_SECTION:
+            continue
+        entry = cfg[section]
+        script = entry.get("path", "").strip()
+        if not script:
+            raise ValueError(f"ERROR: Test '{section}' has no path")
+        timeout = entry.get("timeout", "").strip()
+        try:
+            timeout = float(timeout) if timeout else None
+        except ValueError:
+            raise ValueError(f"ERROR: Test '{section}': timeout '{timeout}' is not a number")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"ERROR: Test '{section}': timeout must be positive")
+        tests.append(SuiteTest(section, os.path.join(base, script), len(tests) + 1,
+                               entry.get("target", "").strip(), _words(entry.get("tags", "")),
+                               _words(entry.get("after", "")), timeout))
+    if not tests:
+        raise ValueError(f"ERROR: Manifest {path} lists no tests")
+
+    by_name = {t.name: t for t in tests}
+    for test in tests:
+        for dep in test.after:
+            if dep not in by_name:
+                raise ValueError(f"ERROR: Test '{test.name}' depends on unknown test '{dep}'")
+    _check_cycles(by_name)
+
+    if tags:
+        wanted = {t.name for t in tests if t.tags & set(tags)}
+        stack = list(wanted)
+        while stack:
+            for dep in by_name[stack.pop()].after:
+                if dep not in wanted:
+                    wanted.add(dep)
+                    stack.append(dep)
+        tests = [t for t in tests if t.name in wanted]
+        if not tests:
+            raise ValueError(f"ERROR: No test in {path} is tagged {' or '.join(tags)}")
+
+    output = os.path.join(base, info["output"].strip()) if info.get("output", "").strip() else default_output
+    return Suite(name, path, tests, output, _flag(info.get("stop_on_fail", "")))
+
+
+def _check_cycles(by_name):
+    state = {}          # name -> 1 while being visited, 2 when done
+
+    def visit(name, chain):
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            cycle = chain[chain.index(name):] + [name]
+            raise ValueError(f"ERROR: Dependency cycle: {' -> '.join(cycle)}")
+        state[name] = 1
+        for dep in by_name[name].after:
+            visit(dep, chain + [name])
+        state[name] = 2
+
+    for name in by_name:
+        visit(name, [])
+
+
+async def run_suite(suite, run_test, on_result):
+    """
+    Run the suite's tests as far as their dependencies allow.
+    run_test(test) is a coroutine returning (result, seconds, target name);
+    on_result(test) is called as each test passes, fails or is skipped.
+    """
+    suite.started = time.time()
+    start = time.monotonic()
+    pending = list(suite.tests)
+    running = {}
+    failed = False
+
+    def skip(test, reason):
+        test.verdict, test.result = "SKIP", reason
+        on_result(test)
+
+    try:
+        while pending or running:
+            for test in list(pending):
+                verdicts = {dep: suite.by_name[dep].verdict for dep in test.after}
+                blocked = [dep for dep, verdict in verdicts.items() if verdict in ("FAIL", "SKIP")]
+                if failed and suite.stop_on_fail:
+                    pending.remove(test)
+                    skip(test, "Skipped: the suite stops on the first failure")
+                elif blocked:
+                    pending.remove(test)
+                    skip(test, f"Skipped: {', '.join(blocked)} did not pass")
+                elif all(verdict == "PASS" for verdict in verdicts.values()):
+                    pending.remove(test)
+                    running[asyncio.ensure_future(run_test(test))] = test
+            if not running:
+                continue        # skips may have unblocked (skipped) further tests
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                test = running.pop(task)
+                test.result, test.seconds, test.ran_on = task.result()
+                test.verdict = "PASS" if test.result.startswith("PASS") else "FAIL"
+                failed = failed or test.verdict == "FAIL"
+                on_result(test)
+    finally:
+        for task in running:
+            task.cancel()
+        if running:         # cancelled: wait until the tests have let go of their targets
+            await asyncio.wait(running)
+        suite.seconds = time.monotonic() - start
+
+
+def _headline(result):
+    # "FAIL: reason" -> "reason"; a bare "FAIL:" -> the first verdict rule hit, else the next line
+    lines = [line.strip() for line in result.splitlines() if line.strip()]
+    first = lines[0].partition(":")[2].strip() if lines else ""
+    rules = [line for line in lines if line.startswith("Rule:")]
+    return first or (rules or lines[1:] or ["FAIL"])[0]
+
+
+def junit_xml(suite):
+    passed, failed, skipped = suite.counts()
+    root = ET.Element("testsuites", name=suite.name, tests=str(len(suite.tests)),
+                      failures=str(failed), skipped=str(skipped), time=f"{suite.seconds:.3f}")
+    node = ET.SubElement(root, "testsuite", name=suite.name, tests=str(len(suite.tests)),
+                         failures=str(failed), errors="0", skipped=str(skipped),
+                         time=f"{suite.seconds:.3f}", hostname=socket.gethostname(),
+                         timestamp=datetime.fromtimestamp(suite.started).isoformat(timespec="seconds"))
+    for test in suite.tests:
+        case = ET.SubElement(node, "testcase", name=test.name, classname=suite.name,
+                             file=test.path, time=f"{test.seconds:.3f}")
+        if test.ran_on:
+            props = ET.SubElement(case, "properties")
+            ET.SubElement(props, "property", name="target", value=test.ran_on)
+        if test.verdict == "FAIL":
+            ET.SubElement(case, "failure", message=_headline(test.result)).text = test.result
+        elif test.verdict == "SKIP":
+            ET.SubElement(case, "skipped", message=test.result)
+        else:
+            ET.SubElement(case, "system-out").text = test.result
+    return ET.ElementTree(root)
+
+
+def canoe_xml(suite):
+    # same layout as canoe/test.xml: one testcase per test calling CAPL_FUNCTION
+    # with the script path, its index and status (1 pass, 0 fail, -1 skipped)
+    ET.register_namespace("", CANOE_NS)
+    ET.register_namespace("xsi", "http://www.w3.org/2001/XMLSchema-instance")
+    q = lambda tag: f"{{{CANOE_NS}}}{tag}"
+    root = ET.Element(q("testmodule"), {
+        "title": suite.name, "version": "",
+        "{http://www.w3.org/2001/XMLSchema-instance}schemaLocation": f"{CANOE_NS} testmodule_1.16.xsd",
+    })
+    group = ET.SubElement(root, q("testgroup"), title=f"{suite.name}: {suite.summary().split(': ', 2)[-1]}")
+    status = {"PASS": "1", "FAIL": "0", "SKIP": "-1"}
+    for test in suite.tests:
+        case = ET.SubElement(group, q("testcase"), title=test.name, ident=f"{test.index:05d}")
+        func = ET.SubElement(case, q("capltestfunction"), name=CAPL_FUNCTION,
+                             title=f"{test.name}: {test.verdict} in {test.seconds:.3f}s")
+        for name, kind, value in (("Path", "string", test.path), ("iteration", "int", str(test.index)),
+                                  ("status", "int", status.get(test.verdict, "0"))):
+            ET.SubElement(func, q("caplparam"), name=name, type=kind).text = value
+    return ET.ElementTree(root)
+
+
+def write_reports(suite):
+    """Write the JUnit and CANoe XML files into suite.output; returns their paths."""
+    os.makedirs(suite.output, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(suite.started))
+    name = re.sub(r"[^\w.-]", "_", suite.name)
+    base = os.path.join(suite.output, f"{stamp}_{name}")
+    paths = (base + "_junit.xml", base + "_testmodule.xml")
+    for tree, path in zip((junit_xml(suite), canoe_xml(suite)), paths):
+        ET.indent(tree)
+        tree.write(path, encoding="utf-8", xml_declaration=True)
+    return paths
@@ -74,50 +74,52 @@ def test_ping():
         print("✗ PING test failed")
 
 def test_run_cmm():
-    """Test RUN_CMM command"""
+    """Test RUN command with a CMM script"""
     print("\n" + "="*60)
-    print("TEST 2: RUN_CMM Command")
+    print("TEST 2: RUN Command (CMM)")
     print("="*60)
     
     # Test with example.cmm file
     test_file = "example.cmm"
     count = 2
     
-    command = f"RUN_CMM|{test_file}|{count}"
+    command = f"RUN|{test_file}|{count}"
     response = send_command(command)
     
     if response:
         if "SUCCESS" in response or "PASS" in response:
-            print("✓ RUN_CMM test passed")
+            print("✓ RUN (CMM) test passed")
         elif "ERROR" in response:
-            print("✗ RUN_CMM test failed with error")
+            print("✗ RUN (CMM) test failed with error")
         else:
-            print("? RUN_CMM test completed (check output above)")
+            print("? RUN (CMM) test completed (check output above)")
     else:
-        print("✗ RUN_CMM test failed - no response")
+        print("✗ RUN (CMM) test failed - no response")
 
 def test_run_vflash():
-    """Test RUN_VFLASH command"""
+    """Test RUN command with a vFlash project"""
     print("\n" + "="*60)
-    print("TEST 3: RUN_VFLASH Command")
+    print("TEST 3: RUN Command (vFlash)")
     print("="*60)
     
     # Test with a sample vFlash project
-    test_file = "sample_project.vfp"
+    test_file = "sample_project.vflashpack"
     count = 1
     
-    command = f"RUN_VFLASH|{test_file}|{count}"
+    command = f"RUN|{test_file}|{count}"
     response = send_command(command)
     
     if response:
         if "SUCCESS" in response or "PASS" in response:
-            print("✓ RUN_VFLASH test passed")
+            print("✓ RUN (vFlash) test passed")
+        elif "not implemented" in response:
+            print("- RUN (vFlash) reached the runner, which is still a placeholder")
         elif "ERROR" in response:
-            print("✗ RUN_VFLASH test failed with error")
+            print("✗ RUN (vFlash) test failed with error")
         else:
-            print("? RUN_VFLASH test completed (check output above)")
+            print("? RUN (vFlash) test completed (check output above)")
     else:
-        print("✗ RUN_VFLASH test failed - no response")
+        print("✗ RUN (vFlash) test failed - no response")
 
 def test_invalid_commands():
     """Test invalid commands"""
@@ -133,7 +135,7 @@ def test_invalid_commands():
         print("✗ Invalid command test failed")
     
     # Test missing parameters
-    response = send_command("RUN_CMM|")
+    response = send_command("RUN|")
     if response and "ERROR" in response:
         print("✓ Missing parameters test passed")
     else:
@@ -146,8 +148,8 @@ def test_tool_discovery():
     print("="*60)
     
     # Test unknown tool
-    response = send_command("UNKNOWN_TOOL|test|1")
-    if response and "Unknown command" in response:
+    response = send_command("RUN|test.unknown|1")
+    if response and "Unknown or unsupported tool" in response:
         print("✓ Tool discovery test passed")
     else:
         print("✗ Tool discovery test failed")
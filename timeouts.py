@@ -0,0 +1,82 @@
+# timeouts.py
+# Adaptive script timeouts. The server keeps the durations of the last
+# passing runs of every script path (seeded from the run history the first
+# time a path is seen) and gives each run the timeout
+#
+#     p99 of those durations x timeout_factor, within timeout_min..timeout_max
+#
+# A script with fewer than timeout_runs passing runs, or any script while
+# timeout_factor is 0, gets the configured [runtime] timeout.
+import sqlite3
+import threading
+from collections import deque
+
+from history import MAX_PAGE
+from stats import percentile
+
+
+def script_key(path):
+    return path.replace("\\", "/").lower()
+
+
+class ScriptProfiles:
+    def __init__(self, history=None):
+        self.history = history
+        self._runs = {}         # script_key -> deque of recent passing durations, oldest first
+        self._lock = threading.Lock()
+
+    def _seed(self, path, window):
+        # the newest passing runs of `path` from the history; runs of other
+        # scripts with the same file name are filtered out here
+        if not self.history:
+            return []
+        try:
+            rows, _ = self.history.query(script=path, verdict="PASS", limit=min(4 * window, MAX_PAGE))
+        except sqlite3.Error as e:
+            print(f"[PYTHON] Cannot read the run history of {path}: {e}")
+            return []
+        key = script_key(path)
+        return [row[2] for row in rows if script_key(row[7]) == key][:window][::-1]
+
+    def _durations(self, path, window):
+        # called with the lock held
+        key = script_key(path)
+        runs = self._runs.get(key)
+        if runs is None:
+            runs = self._runs[key] = deque(self._seed(path, window), maxlen=window)
+        elif runs.maxlen != window:         # timeout_window was changed (hot reload)
+            runs = self._runs[key] = deque(runs, maxlen=window)
+        return runs
+
+    def record(self, path, seconds, settings):
+        """Add a passing run of `path`; call it before the run is handed to the history."""
+        with self._lock:
+            self._durations(path, settings.timeout_window).append(seconds)
+
+    def timeout_for(self, path, settings):
+        """
+        (seconds, how it was chosen) for the next run of `path`; seconds is
+        None when the configured [runtime] timeout applies.
+        """
+        if settings.timeout_factor <= 0:
+            return None, "configured"
+        with self._lock:
+            values = sorted(self._durations(path, settings.timeout_window))
+        if len(values) < settings.timeout_runs:
+            return None, f"configured, {len(values)}/{settings.timeout_runs} runs known"
+        p50, p99 = percentile(values, 50), percentile(values, 99)
+        seconds = min(max(p99 * settings.timeout_factor, settings.timeout_min), settings.timeout_max)
+        return seconds, f"adaptive: p50={p50:.2f}s p99={p99:.2f}s over {len(values)} runs"
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def get_profiles(history):
+    """Process-wide ScriptProfiles, seeded from `history` (a RunHistory or None)."""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = ScriptProfiles(history)
+        return _profiles
@@ -0,0 +1,86 @@
+# capture.py
+# Bounded capture of the TRACE32 message log of one run. The most recent
+# lines are kept in a fixed-size ring for the reply; once the ring overflows,
+# the full log (in order, repeats included) is spilled to a per-run file in
+# <tmp_dir>/logs, so memory stays flat however long a script runs.
+import collections
+import itertools
+import os
+import re
+import threading
+import time
+
+LOG_SUBDIR = "logs"
+
+_ids = itertools.count(1)
+_prune_lock = threading.Lock()
+
+
+def _prune(log_dir, keep):
+    # drop the oldest run logs beyond `keep`
+    with _prune_lock:
+        try:
+            logs = sorted(
+                (e for e in os.scandir(log_dir) if e.name.endswith(".log")),
+                key=lambda e: e.stat().st_mtime,
+            )
+        except OSError:
+            return
+        for entry in logs[:max(len(logs) - keep, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class LogCapture:
+    def __init__(self, tmp_dir, name="run", tail_lines=200, keep_logs=50):
+        self.log_dir = os.path.join(tmp_dir, LOG_SUBDIR)
+        self.name = re.sub(r"[^\w.-]", "_", name)
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.keep_logs = keep_logs
+        self.count = 0
+        self.path = None
+        self._file = None
+        self._spill_failed = False
+
+    def add(self, line):
+        if self._file is None and not self._spill_failed and len(self.tail) == self.tail.maxlen:
+            self._spill()
+        if self._file is not None:
+            self._file.write(line + "\n")
+        self.tail.append(line)
+        self.count += 1
+
+    def _spill(self):
+        # first overflow: start the run log with everything seen so far
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.log_dir, f"{stamp}_{os.getpid()}-{next(_ids)}_{self.name}.log")
+            self._file = open(path, "w", encoding="utf-8", errors="replace")
+        except OSError as e:
+            print(f"[PYTHON] Cannot write run log to {self.log_dir}: {e}")
+            self._spill_failed = True        # keep the tail only
+            return
+        self.path = path
+        self._file.writelines(line + "\n" for line in self.tail)
+        _prune(self.log_dir, self.keep_logs)
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def text(self):
+        """Tail of the log, prefixed with a pointer to the full log if it was spilled."""
+        lines = list(self.tail)
+        omitted = self.count - len(lines)
+        if omitted:
+            where = f"full log: {self.path}" if self.spilled else "no run log written"
+            lines.insert(0, f"[{omitted} earlier lines omitted, {where}]")
+        return "\n".join(lines)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,130 @@
+# delta_flash.py
+# This module programs a binary image into target flash, sector by sector,
+# skipping every sector whose content already matches the image.
+#
+# [flash] settings in config.ini:
+#   setup_script  CMM run first to declare the flash (FLASH.RESet/FLASH.Create...)
+#   base_address  address the image starts at (default 0x0)
+#   sector_size   erase unit in bytes (default 0x1000)
+#   checksum      readback: read each sector back and CRC it locally (default)
+#                 target:   let TRACE32 compute Data.SUM /CRC32 on the debugger
+import ctypes
+import zlib
+
+from settings import get_settings
+from trace32.memory import ACCESS_DATA, DEFAULT_CHUNK, chunk_for, read_memory, write_memory
+from trace32.run_cmm import PhaseTimer, borrow_trace32, run_cmm_script, wait_for_script_completion
+
+
+def sector_checksums(image, sector_size):
+    view = memoryview(image)
+    return [zlib.crc32(view[off:off + sector_size]) for off in range(0, len(view), sector_size)]
+
+
+def _cmd(api, cmd):
+    rc = api.T32_Cmd(cmd.encode())
+    if rc != 0:
+        raise RuntimeError(f"'{cmd}' failed: {rc}")
+
+
+def _range(address, size):
+    return f"0x{address:X}--0x{address + size - 1:X}"
+
+
+def target_checksum(api, address, size, method="readback", chunk=DEFAULT_CHUNK):
+    if method == "target":
+        _cmd(api, f"Data.SUM {_range(address, size)} /CRC32")
+        _cmd(api, "EVAL Data.SUM()")
+        value = ctypes.c_uint32()
+        if api.T32_EvalGet(ctypes.byref(value)) != 0:
+            raise RuntimeError("T32_EvalGet failed")
+        return value.value
+    return zlib.crc32(read_memory(api, address, size, ACCESS_DATA, chunk))
+
+
+def program_sector(api, address, data, chunk=DEFAULT_CHUNK):
+    _cmd(api, f"FLASH.Erase {_range(address, len(data))}")
+    _cmd(api, f"FLASH.Program {_range(address, len(data))}")
+    try:
+        write_memory(api, address, data, ACCESS_DATA, chunk)
+    finally:
+        _cmd(api, "FLASH.Program off")
+
+
+def delta_flash(api, image, base, sector_size, checksum="readback", chunk=DEFAULT_CHUNK, on_message=None,
+                cancel=None):
+    """
+    Program only the sectors of `image` (a bytearray) that differ on the
+    target and verify them afterwards. Returns a report dict. Once `cancel`
+    (an Event) is set, no further sector is started.
+    """
+    log = on_message or (lambda line: None)
+    view = memoryview(image)
+    wanted = sector_checksums(image, sector_size)
+    report = {"sectors": len(wanted), "programmed": 0, "skipped": 0,
+              "bytes_programmed": 0, "bytes_skipped": 0, "failed": [], "cancelled": False}
+
+    for index, crc in enumerate(wanted):
+        if cancel is not None and cancel.is_set():
+            report["cancelled"] = True
+            log(f"Cancelled before sector {index}")
+            break
+        offset = index * sector_size
+        data = view[offset:offset + sector_size]
+        address = base + offset
+        if target_checksum(api, address, len(data), checksum, chunk) == crc:
+            report["skipped"] += 1
+            report["bytes_skipped"] += len(data)
+            continue
+
+        log(f"Programming sector {index} at 0x{address:08X} ({len(data)} bytes)")
+        program_sector(api, address, data, chunk)
+        report["programmed"] += 1
+        report["bytes_programmed"] += len(data)
+        if target_checksum(api, address, len(data), checksum, chunk) != crc:
+            report["failed"].append(index)
+            log(f"Verify failed for sector {index} at 0x{address:08X}")
+
+    return report
+
+
+def format_report(report):
+    return (f"{report['programmed']}/{report['sectors']} sectors programmed "
+            f"({report['bytes_programmed']} bytes), {report['skipped']} skipped "
+            f"({report['bytes_skipped']} bytes)")
+
+
+def run_cflash(image_path: str, on_message=None, target=None, cancel=None):
+    s = get_settings()
+    chunk = chunk_for(target.packlen if target else s.trace32_packlen)
+    timer = PhaseTimer("CFLASH")
+    try:
+        with open(image_path, "rb") as f:
+            image = bytearray(f.read())
+    except OSError as e:
+        return f"FAIL: Cannot read flash image: {e}"
+    timer.mark("load")
+
+    try:
+        with borrow_trace32(target, s) as api:
+            timer.mark("connect")
+            if s.flash_setup_script:
+                if not run_cmm_script(api, s.flash_setup_script) or not wait_for_script_completion(api, s.timeout):
+                    return "FAIL: Flash setup script failed."
+                timer.mark("setup")
+
+            report = delta_flash(api, image, s.flash_base_address, s.flash_sector_size,
+                                 s.flash_checksum, chunk, on_message, cancel)
+            timer.mark("flash")
+
+    except (ConnectionError, RuntimeError) as e:
+        return f"FAIL: TRACE32 flash access failed. {e}"
+
+    if report["cancelled"]:
+        return f"FAIL: Cancelled, flash not completed\n{format_report(report)}\n{timer.summary()}"
+    if report["failed"]:
+        sectors = ", ".join(str(i) for i in report["failed"])
+        return f"FAIL: Verify failed for sector(s) {sectors}\n{format_report(report)}\n{timer.summary()}"
+    if not report["programmed"]:
+        return f"PASS: Target already up to date\n{format_report(report)}\n{timer.summary()}"
+    return f"PASS: Flash updated\n{format_report(report)}\n{timer.summary()}"
@@ -0,0 +1,203 @@
+# hex_loader.py
+# HEX_TOOL: download an Intel HEX or Motorola S-record image to the target.
+# The file is memory-mapped and split into lines one window at a time; each
+# record's payload is appended straight to the address block it continues,
+# so the image ends up as a few contiguous blocks (one bytearray each) and
+# no per-record objects are kept. Checksums are checked while scanning. The blocks are
+# then written with chunked T32_WriteMemory calls and verified by CRC.
+#
+# With [flash] setup_script set, the download runs as a flash programming
+# session (FLASH.ReProgram ALL ... FLASH.ReProgram off), so TRACE32 erases
+# and programs only the sectors whose content changed; without it the image
+# goes to RAM.
+import binascii
+import mmap
+import os
+import zlib
+
+from settings import get_settings
+from trace32.delta_flash import _cmd, target_checksum
+from trace32.memory import ACCESS_DATA, chunk_for, write_memory
+from trace32.run_cmm import PhaseTimer, borrow_trace32, run_cmm_script, wait_for_script_completion
+
+SREC_ADDRESS = {b"1": 2, b"2": 3, b"3": 4}    # data records: address bytes
+WINDOW       = 1 << 20                        # bytes of the mapped file split into lines at a time
+
+
+def merge_blocks(blocks):
+    """(address, bytearray) blocks sorted by address; adjacent or overlapping ones merged (later records win)."""
+    groups = []     # [start, end, indexes of the blocks in it]
+    for i in sorted(range(len(blocks)), key=lambda i: blocks[i][0]):
+        start, data = blocks[i]
+        if groups and start <= groups[-1][1]:
+            groups[-1][1] = max(groups[-1][1], start + len(data))
+            groups[-1][2].append(i)
+        else:
+            groups.append([start, start + len(data), [i]])
+    merged = []
+    for start, end, members in groups:
+        if len(members) == 1:
+            merged.append((start, blocks[members[0]][1]))
+            continue
+        data = bytearray(end - start)
+        for i in sorted(members):       # file order, so a later record overwrites an earlier one
+            offset = blocks[i][0] - start
+            data[offset:offset + len(blocks[i][1])] = blocks[i][1]
+        merged.append((start, data))
+    return merged
+
+
+def _windows(mm):
+    # (offset, bytes) pieces of the mapped file that end on a line break
+    pos, end = 0, len(mm)
+    while pos < end:
+        stop = mm.rfind(b"\n", pos, pos + WINDOW) if pos + WINDOW < end else end
+        if stop <= pos:             # no line break in the window: cut it there, dropping nothing
+            stop = min(pos + WINDOW, end)
+            yield pos, mm[pos:stop]
+            pos = stop
+            continue
+        yield pos, mm[pos:stop]
+        pos = stop + 1
+
+
+def _bad_record(mm, pos, line, problem):
+    offset = mm.find(line, pos)
+    number = mm[:offset].count(b"\n") + 1 if offset >= 0 else "?"
+    raise ValueError(f"{problem} on line {number}: {line[:48].decode(errors='replace')}")
+
+
+def _decode(mm, pos, line, lead):
+    # record bytes after `lead`; raises ValueError naming the line
+    try:
+        return binascii.unhexlify(line[lead:])
+    except binascii.Error:
+        _bad_record(mm, pos, line, "Invalid hex digits")
+
+
+def parse_intel_hex(mm):
+    blocks, base, data, next_address = [], 0, None, -1
+    unhexlify = binascii.unhexlify
+    for pos, window in _windows(mm):
+        for line in window.split(b"\n"):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = unhexlify(line[1:])
+            except binascii.Error:
+                record = _decode(mm, pos, line, 1)
+            if line[0] != 0x3A or len(record) < 5 or len(record) != record[0] + 5:      # ':'
+                _bad_record(mm, pos, line, "Bad record")
+            if sum(record) & 0xFF:
+                _bad_record(mm, pos, line, "Checksum error")
+            kind = record[3]
+            if kind == 0:
+                address = base + (record[1] << 8 | record[2])
+                if address != next_address:         # not a continuation: start a new block
+                    data = bytearray()
+                    blocks.append((address, data))
+                data += record[4:-1]
+                next_address = address + record[0]
+            elif kind == 1:
+                return merge_blocks(blocks)
+            elif kind == 2:
+                base = (record[4] << 8 | record[5]) << 4
+            elif kind == 4:
+                base = (record[4] << 8 | record[5]) << 16
+    return merge_blocks(blocks)
+
+
+def parse_srecord(mm):
+    blocks, data, next_address = [], None, -1
+    unhexlify = binascii.unhexlify
+    for pos, window in _windows(mm):
+        for line in window.split(b"\n"):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = unhexlify(line[2:])
+            except binascii.Error:
+                record = _decode(mm, pos, line, 2)
+            if line[0] != 0x53 or len(record) < 3 or len(record) != record[0] + 1:      # 'S'
+                _bad_record(mm, pos, line, "Bad record")
+            if sum(record) & 0xFF != 0xFF:
+                _bad_record(mm, pos, line, "Checksum error")
+            kind = line[1:2]
+            width = SREC_ADDRESS.get(kind)
+            if width:
+                address = int.from_bytes(record[1:1 + width], "big")
+                if address != next_address:
+                    data = bytearray()
+                    blocks.append((address, data))
+                data += record[1 + width:-1]
+                next_address = address + len(record) - width - 2
+            elif kind in (b"7", b"8", b"9"):
+                return merge_blocks(blocks)
+    return merge_blocks(blocks)
+
+
+def parse_image(path):
+    """[(address, bytearray), ...] from an Intel HEX or S-record file (by first character)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Image file is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first = mm[:64].lstrip()[:1]
+            if first == b":":
+                return parse_intel_hex(mm)
+            if first == b"S":
+                return parse_srecord(mm)
+            raise ValueError("Not an Intel HEX or S-record file")
+
+
+def run_hex(image_path: str, on_message=None, target=None, cancel=None):
+    s = get_settings()
+    chunk = chunk_for(target.packlen if target else s.trace32_packlen)
+    log = on_message or (lambda line: None)
+    timer = PhaseTimer("HEX_TOOL")
+    try:
+        blocks = parse_image(image_path)
+    except (OSError, ValueError) as e:
+        return f"FAIL: Cannot read image: {e}"
+    timer.mark("parse")
+    total = sum(len(data) for _, data in blocks)
+    log(f"{os.path.basename(image_path)}: {total} bytes in {len(blocks)} block(s)")
+
+    failed, cancelled = [], False
+    try:
+        with borrow_trace32(target, s) as api:
+            timer.mark("connect")
+            flash = bool(s.flash_setup_script)
+            if flash:
+                if not run_cmm_script(api, s.flash_setup_script) or not wait_for_script_completion(api, s.timeout):
+                    return "FAIL: Flash setup script failed."
+                _cmd(api, "FLASH.ReProgram ALL")
+                timer.mark("setup")
+            try:
+                for address, data in blocks:
+                    if cancel is not None and cancel.is_set():
+                        cancelled = True      # between blocks; FLASH.ReProgram off still runs
+                        log(f"Cancelled before block 0x{address:08X}")
+                        break
+                    log(f"Writing 0x{address:08X}..0x{address + len(data) - 1:08X} ({len(data)} bytes)")
+                    write_memory(api, address, data, ACCESS_DATA, chunk)
+            finally:
+                if flash:
+                    _cmd(api, "FLASH.ReProgram off")
+            timer.mark("download")
+            if cancelled:
+                return f"FAIL: Cancelled, image not completely downloaded\n{timer.summary()}"
+            for address, data in blocks:
+                if target_checksum(api, address, len(data), s.flash_checksum, chunk) != zlib.crc32(data):
+                    failed.append(address)
+                    log(f"Verify failed for block at 0x{address:08X}")
+            timer.mark("verify")
+    except (ConnectionError, RuntimeError) as e:
+        return f"FAIL: TRACE32 download failed. {e}"
+
+    summary = f"{total} bytes in {len(blocks)} block(s)\n{timer.summary()}"
+    if failed:
+        return f"FAIL: Verify failed for block(s) {', '.join(f'0x{a:08X}' for a in failed)}\n{summary}"
+    return f"PASS: Image downloaded\n{summary}"
@@ -0,0 +1,45 @@
+# mem_transfer.py
+# Bulk target memory transfers for the READMEM/WRITEMEM commands, on the
+# pooled session of the leased target. Each transfer uses one buffer that is
+# handed to the DLL in chunks sized for the target's PACKLEN (chunk_for)
+# through ctypes views, so no chunk is copied on the way.
+import time
+
+from metrics import count, observe
+from settings import get_settings
+from trace32.memory import ACCESS_DATA, chunk_for, read_memory, write_memory
+from trace32.run_cmm import borrow_trace32
+
+
+def throughput(size, seconds):
+    return f"{size / max(seconds, 1e-6) / 1e6:.2f} MB/s"
+
+
+def _transfer(op, address, size, buf, target, access):
+    s = get_settings()
+    chunk = chunk_for(target.packlen if target else s.trace32_packlen)
+    try:
+        with borrow_trace32(target, s) as api:
+            start = time.monotonic()
+            if op == "read":
+                read_memory(api, address, size, access, chunk, buf)
+            else:
+                write_memory(api, address, buf, access, chunk)
+            seconds = time.monotonic() - start
+    except (ConnectionError, RuntimeError) as e:
+        return f"FAIL: TRACE32 memory {op} failed. {e}"
+    observe("t32_memory_seconds", seconds, op=op)
+    count("t32_memory_bytes_total", size, op=op)
+    verb = "Read" if op == "read" else "Wrote"
+    return (f"PASS: {verb} {size} bytes at 0x{address:08X} in {seconds * 1000:.0f} ms "
+            f"({throughput(size, seconds)}, {chunk} byte chunks)")
+
+
+def read_target(address, size, out, target=None, access=ACCESS_DATA):
+    """READMEM: fill out[:size] from target memory; returns the PASS/FAIL text."""
+    return _transfer("read", address, size, out, target, access)
+
+
+def write_target(address, data, target=None, access=ACCESS_DATA):
+    """WRITEMEM: write `data` (a writable buffer or memoryview) to target memory."""
+    return _transfer("write", address, len(data), data, target, access)
@@ -0,0 +1,42 @@
+# memory.py
+# Chunked target memory access through the TRACE32 API (T32_ReadMemory /
+# T32_WriteMemory). Buffers are passed to the DLL without copying where the
+# caller hands in a writable buffer (bytearray, mmap).
+import ctypes
+
+ACCESS_DATA    = 0x0000   # T32_MEMORY_ACCESS_DATA
+ACCESS_PROGRAM = 0x0001   # T32_MEMORY_ACCESS_PROGRAM
+DEFAULT_CHUNK  = 16 * 1024
+
+
+def chunk_for(packlen):
+    # bytes per T32_ReadMemory/T32_WriteMemory call for a given PACKLEN
+    return max(int(packlen), 1024) * 16
+
+
+def _c_view(buf, offset, size):
+    # ctypes array sharing memory with buf (no copy)
+    return (ctypes.c_char * size).from_buffer(buf, offset)
+
+
+def read_memory(api, address, size, access=ACCESS_DATA, chunk=DEFAULT_CHUNK, out=None):
+    """Read `size` bytes starting at `address` into `out` (or a new bytearray)."""
+    out = out if out is not None else bytearray(size)
+    for offset in range(0, size, chunk):
+        n = min(chunk, size - offset)
+        rc = api.T32_ReadMemory(ctypes.c_uint32(address + offset), access, _c_view(out, offset, n), n)
+        if rc != 0:
+            raise RuntimeError(f"T32_ReadMemory failed at 0x{address + offset:08X}: {rc}")
+    return out
+
+
+def write_memory(api, address, data, access=ACCESS_DATA, chunk=DEFAULT_CHUNK):
+    """Write `data` (a writable buffer, or bytes which are copied once) to `address`."""
+    if isinstance(data, bytes):
+        data = bytearray(data)
+    size = len(data)
+    for offset in range(0, size, chunk):
+        n = min(chunk, size - offset)
+        rc = api.T32_WriteMemory(ctypes.c_uint32(address + offset), access, _c_view(data, offset, n), n)
+        if rc != 0:
+            raise RuntimeError(f"T32_WriteMemory failed at 0x{address + offset:08X}: {rc}")
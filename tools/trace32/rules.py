@@ -0,0 +1,202 @@
+# rules.py
+# Verdict rules for TRACE32 messages. A message is lowercased once; each
+# plain-text rule (like all built-in ones) is one substring check (`in`),
+# and all regex rules are compiled into one regex, one scan for all of them.
+# Folding the plain-text rules into that regex measured no faster (slower
+# for the built-in five). Only the rare matching message is checked rule by
+# rule to find which one fired. Matching is
+# case-insensitive: patterns are case-folded and run on the lowercased
+# message (re.I would be about three times slower). Project rules come from
+# the [rules] section of config.ini:
+#
+#   [rules]
+#   flash_error = fatal: flash programming failed
+#   low_voltage = warn:  VBAT\s*<\s*\d+
+#   all_passed  = pass:  ALL TESTS PASSED
+#   aborting    = off
+#
+# i.e. name = severity: regex. A rule named like a built-in one replaces it,
+# severity "off" disables it.
+import re
+import threading
+
+from settings import get_settings
+
+SEVERITIES = ("pass", "warn", "fail", "fatal")   # ascending; "off" disables a rule
+FAIL_STATUS = (2, 16)                             # T32_GetMessage status codes for errors
+FAIL_RANK = SEVERITIES.index("fail")
+
+BUILTIN_RULES = {
+    "teststep_fail":    ("fail", r"teststepfail"),
+    "fail_tag":         ("fail", r"\[fail\]"),
+    "test_failed":      ("fail", r"test failed"),
+    "aborting":         ("fail", r"aborting test"),
+    "execution_failed": ("fail", r"execution failed"),
+}
+
+
+def fold(pattern):
+    r"""Lowercase a regex for matching lowercased text, keeping escapes (\D, \S, ...)."""
+    out = []
+    chars = iter(pattern)
+    for c in chars:
+        out.append(c + next(chars, "") if c == "\\" else c.lower())
+    return "".join(out)
+
+
+def literal_text(pattern):
+    r"""The text a regex matches if it is plain text (escaped punctuation allowed, e.g. \[fail\]), else None."""
+    out = []
+    chars = iter(pattern)
+    for c in chars:
+        if c == "\\":
+            c = next(chars, "")
+            if not c or c.isalnum():        # \d, \b, \1, ... or a trailing backslash
+                return None
+        elif c in ".^$*+?{}[]()|":
+            return None
+        out.append(c)
+    return "".join(out)
+
+
+class Rule:
+    def __init__(self, name, severity, pattern):
+        self.name = name
+        self.severity = severity
+        self.pattern = pattern
+        self.folded = fold(pattern)
+        self.regex = re.compile(self.folded)
+        self.rank = SEVERITIES.index(severity)
+        literal = literal_text(pattern)
+        self.literal = literal.lower() if literal is not None else None
+
+    def hit(self, low):
+        """Does the rule match `low` (a lowercased message)?"""
+        if self.literal is not None:
+            return self.literal in low
+        return self.regex.search(low) is not None
+
+    def __repr__(self):
+        return f"Rule({self.name}, {self.severity})"
+
+
+# fired when T32_GetMessage reports an error status and no rule matched
+STATUS_RULE = Rule("message_status", "fail", r"(?!x)x")
+
+
+def parse_rule(name, spec):
+    severity, _, pattern = spec.partition(":")
+    severity = severity.strip().lower()
+    if severity == "off":
+        return None
+    if severity not in SEVERITIES or not pattern.strip():
+        raise ValueError(f"Rule '{name}': expected <{'|'.join(SEVERITIES)}>: <regex>, got '{spec}'")
+    pattern = pattern.strip()
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Rule '{name}': invalid regex '{pattern}': {e}")
+    if compiled.groups:
+        raise ValueError(f"Rule '{name}': use (?:...) instead of capturing groups")
+    try:
+        return Rule(name, severity, pattern)
+    except re.error as e:       # valid as written, but not once case-folded (e.g. [Z-a])
+        raise ValueError(f"Rule '{name}': regex '{pattern}' does not work case-insensitively: {e}")
+
+
+class RuleSet:
+    def __init__(self, rules, fail_status=FAIL_STATUS):
+        self.rules = sorted(rules, key=lambda r: -r.rank)    # most severe first
+        self.fail_status = frozenset(fail_status)
+        self.needs_pass = any(r.severity == "pass" for r in self.rules)
+        self.literals = [rule.literal for rule in self.rules if rule.literal is not None]
+        combined = "|".join(f"(?:{rule.folded})" for rule in self.rules if rule.literal is None)
+        self._search = re.compile(combined).search if combined else None
+
+    def match(self, msg):
+        """Most severe rule matching `msg`, or None."""
+        low = msg.lower()
+        for literal in self.literals:
+            if literal in low:
+                break
+        else:
+            if self._search is None or self._search(low) is None:
+                return None
+        return next((rule for rule in self.rules if rule.hit(low)), None)
+
+
+def build_rules(spec):
+    """RuleSet from the built-in rules updated with `spec` ({name: "severity: regex"})."""
+    rules = {name: Rule(name, *rule) for name, rule in BUILTIN_RULES.items()}
+    for name, text in spec.items():
+        rule = parse_rule(name, text)
+        if rule is None:
+            rules.pop(name, None)
+        else:
+            rules[name] = rule
+    return RuleSet(rules.values())
+
+
+_cache = (None, None)
+_lock = threading.Lock()
+
+
+def load_rules(settings=None):
+    """RuleSet for the current [rules]; an invalid edit keeps the previous rules."""
+    global _cache
+    s = settings or get_settings()
+    generation, rules = _cache
+    if generation == s.generation:
+        return rules
+    with _lock:
+        try:
+            rules = build_rules(s.rules)
+        except (ValueError, re.error) as e:
+            if rules is None:
+                raise
+            print(f"[PYTHON] Keeping previous rules, invalid [rules]: {e}")
+        _cache = (s.generation, rules)
+        return rules
+
+
+class Verdict:
+    """Tracks which rules fired over one run."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.first = {}      # rule name -> first matching message
+        self.counts = {}     # rule name -> matches
+        self.fired = []      # rules in the order they first fired
+        self.failed = None   # first fail/fatal rule
+        self.fatal = False
+        self.passed = False
+
+    def check(self, msg, status=0):
+        rule = self.rules.match(msg)
+        if status in self.rules.fail_status and (rule is None or rule.rank < FAIL_RANK):
+            rule = STATUS_RULE
+        if rule is None:
+            return None
+        if rule.name not in self.counts:
+            self.counts[rule.name] = 0
+            self.first[rule.name] = msg
+            self.fired.append(rule)
+        self.counts[rule.name] += 1
+        if rule.severity == "pass":
+            self.passed = True
+        elif rule.rank >= FAIL_RANK:
+            self.failed = self.failed or rule
+            self.fatal = self.fatal or rule.severity == "fatal"
+        return rule
+
+    @property
+    def error(self):
+        return self.failed is not None or (self.rules.needs_pass and not self.passed)
+
+    def summary(self):
+        """One line per fired rule, e.g. "Rule: test_failed (fail) x2: <first message>"."""
+        lines = [f"Rule: {r.name} ({r.severity}) x{self.counts[r.name]}: {self.first[r.name]}"
+                 for r in self.fired if r.severity != "pass"]
+        if self.rules.needs_pass and not self.passed and self.failed is None:
+            lines.append("Rule: no pass rule matched")
+        return "\n".join(lines)
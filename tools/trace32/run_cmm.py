@@ -1,55 +1,149 @@
 # run_cmm.py
 # This module provides functionality to run CMM scripts in TRACE32.
 import ctypes
-import time
-import configparser
 import os
+import time
 
 T32_DEV = 0  
 
-from auto_config import get_app_folder, CONFIG_PATH
+from metrics import observe
+from settings import get_settings
+from trace32.capture import LogCapture
+from trace32.rules import Verdict, load_rules
+from trace32.session import get_pool
+
+# completion_mode ([runtime]):
+# "idle": stop collecting once the script is done and the message line is quiet
+# "inactivity": always wait inactivity_timeout without new messages (old behaviour)
+
+POLL_MIN    = 0.005   # first poll delay, doubled while nothing changes
+POLL_MAX    = 0.1
+DRAIN_POLLS = 3       # quiet polls after the script ended before we stop reading
+MESSAGE_BUFFER = 4096 # T32_GetMessage buffer; 256 bytes truncated long lines
 
-# Load config.ini
-cfg = configparser.ConfigParser()
-cfg.read(CONFIG_PATH)
-# Use values from config, fallback to files next to exe (_MEIPASS)
-APP_DIR = get_app_folder()
 
-T32_EXE    = cfg.get("paths", "trace32_exe", fallback=os.path.join(APP_DIR, "bin", "t32marm.exe"))
-T32_CONFIG = cfg.get("paths", "trace32_config", fallback=os.path.join(APP_DIR, "dll", "config.t32"))
-T32_DLL    = cfg.get("paths", "trace32_dll", fallback=os.path.join(APP_DIR, "dll", "t32api64.dll"))
-NODE               = cfg.get("runtime", "trace32_node", fallback="localhost")
-PORT               = cfg.get("runtime", "trace32_port", fallback="20000")
-PACKLEN            = cfg.get("runtime", "trace32_packlen", fallback="1024")
-TIMEOUT            = cfg.getint("runtime", "timeout", fallback=20)
-INACTIVITY_TIMEOUT = cfg.getint("runtime", "inactivity_timeout", fallback=5)
+def borrow_trace32(target=None, settings=None):
+    # Shared, long-lived connection; see trace32/session.py
+    s = settings or get_settings()
+    if target is None:
+        return get_pool(s.trace32_dll).borrow(s.trace32_node, s.trace32_port, s.trace32_packlen)
+    return get_pool(s.trace32_dll).borrow(target.node, target.port, target.packlen)
 
+class Backoff:
+    def __init__(self, start=POLL_MIN, limit=POLL_MAX):
+        self.start = start
+        self.limit = limit
+        self.delay = start
 
+    def reset(self):
+        self.delay = self.start
 
+    def sleep(self):
+        time.sleep(self.delay)
+        self.delay = min(self.delay * 2, self.limit)
 
-def init_trace32():
-    api = ctypes.cdll.LoadLibrary(T32_DLL)
-    for _ in range(20):
-        if (
-            api.T32_Config(b"NODE=", NODE.encode()) == 0 and
-            api.T32_Config(b"PORT=", PORT.encode()) == 0 and
-            api.T32_Config(b"PACKLEN=", PACKLEN.encode()) == 0 and
-            api.T32_Init() == 0
-        ):
-            return api
-        time.sleep(0.25)
-    return None
 
-def wait_for_script_completion(api, timeout=TIMEOUT):
+class PhaseTimer:
+    """Times consecutive phases of a run; each phase also feeds t32_phase_seconds."""
+
+    def __init__(self, tool="TRACE32"):
+        self.tool = tool
+        self.phases = {}
+        self.started = self._last = time.monotonic()
+
+    def mark(self, phase):
+        now = time.monotonic()
+        self.phases[phase] = now - self._last
+        self._last = now
+        observe("t32_phase_seconds", self.phases[phase], tool=self.tool, phase=phase)
+
+    def summary(self):
+        parts = [f"{name}={secs * 1000:.0f}ms" for name, secs in self.phases.items()]
+        parts.append(f"total={(self._last - self.started) * 1000:.0f}ms")
+        return "Timings: " + ", ".join(parts)
+
+
+def get_practice_state(api):
     state = ctypes.c_int(-1)
+    rc = api.T32_GetPracticeState(ctypes.byref(state))
+    if rc != 0:
+        raise ConnectionError(f"Failed to get script state: {rc}")
+    return state.value
+
+class MessageReader:
+    """
+    Polls T32_GetMessage and classifies each new line with the verdict
+    rules (trace32/rules.py). The message line keeps showing the last
+    message, so a poll only counts as new when it differs from the previous
+    one; a line that comes back later is recorded again. New lines go to
+    `on_message` as they arrive and into a bounded LogCapture; its tail is
+    returned by text() when `keep` is set.
+    """
+
+    def __init__(self, api, on_message=None, keep=True, rules=None, capture=None, cancel=None):
+        self.api = api
+        self.on_message = on_message
+        self.cancel = cancel        # Event-like; set when the client cancelled the run
+        self.keep = keep
+        self.buffer = ctypes.create_string_buffer(MESSAGE_BUFFER)
+        self.status = ctypes.c_uint16()
+        self.verdict = Verdict(rules or load_rules())
+        self.capture = capture or LogCapture(get_settings().tmp_dir)
+        self.timed_out = False
+        self.last = None
+
+    def poll(self):
+        rc = self.api.T32_GetMessage(self.buffer, ctypes.byref(self.status))
+        msg = self.buffer.value.decode("utf-8", errors="ignore").strip()
+        current = (msg, self.status.value)
+        if rc != 0 or not msg or current == self.last:
+            return False
+
+        self.last = current
+        self.add(msg)
+        self.verdict.check(msg, self.status.value)
+        return True
+
+    @property
+    def error_detected(self):
+        return self.timed_out or self.verdict.error
+
+    @property
+    def fatal(self):
+        return self.verdict.fatal
+
+    @property
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def add(self, msg):
+        self.capture.add(msg)
+        if self.on_message:
+            self.on_message(msg)
+
+    def text(self):
+        if self.keep:
+            return self.capture.text()
+        return f"Full log: {self.capture.path}" if self.capture.spilled else ""
+
+    def close(self):
+        self.capture.close()
+
+
+def wait_for_script_completion(api, timeout=None, reader=None):
+    if timeout is None:
+        timeout = get_settings().timeout
     start_time = time.monotonic()
+    backoff = Backoff()
     while time.monotonic() - start_time < timeout:
-        rc = api.T32_GetPracticeState(ctypes.byref(state))
-        if rc != 0:
-            raise ConnectionError(f"Failed to get script state: {rc}")
-        if state.value == 0:  # script finished
+        if get_practice_state(api) == 0:  # script finished
             return True
-        time.sleep(0.1)
+        if reader and (reader.fatal or reader.cancelled):
+            return True
+        if reader and reader.poll():
+            backoff.reset()
+        else:
+            backoff.sleep()
     return False
 
 def run_cmm_script(api, cmm_path):
@@ -58,73 +152,102 @@ def run_cmm_script(api, cmm_path):
     return api.T32_Cmd(f'DO "{path}"'.encode()) == 0
 
 
-def collect_messages_and_detect_error(api, timeout=TIMEOUT, inactivity_timeout=INACTIVITY_TIMEOUT):
-    buffer = ctypes.create_string_buffer(256)
-    status = ctypes.c_uint16()
+def collect_messages_and_detect_error(api, timeout=None, inactivity_timeout=None,
+                                      mode=None, reader=None):
+    s = get_settings()
+    timeout = s.timeout if timeout is None else timeout
+    inactivity_timeout = s.inactivity_timeout if inactivity_timeout is None else inactivity_timeout
+    mode = mode or s.completion_mode
+    reader = reader or MessageReader(api)
     start = last_time = time.monotonic()
-    error_detected = False
-    messages = []
-    seen_msgs = set()
-    fail_keywords = ["teststepfail", "[fail]", "test failed", "aborting test", "execution failed"]
+    backoff = Backoff()
+    quiet_polls = 0
 
     while True:
         now = time.monotonic()
         if now - start > timeout:
-            error_detected = True
-            messages.append("⚠️ Timeout: script did not complete in time.")
+            reader.timed_out = True
+            reader.add("⚠️ Timeout: script did not complete in time.")
             break
 
-        rc = api.T32_GetMessage(buffer, ctypes.byref(status))
-        msg = buffer.value.decode("utf-8", errors="ignore").strip()
+        if reader.fatal or reader.cancelled:
+            break
 
-        if rc == 0 and msg and msg not in seen_msgs:
-            seen_msgs.add(msg)
-            messages.append(msg)
+        if reader.poll():
             last_time = now
-
-            # explicit checks
-            if status.value in (2, 16):
-                error_detected = True
-                print(f"[DEBUG] status.value {status.value} indicates error")
-            if any(k in msg.lower() for k in fail_keywords):
-                error_detected = True
-
+            backoff.reset()
+            quiet_polls = 0
         else:
             # no new message
-            time.sleep(0.05)
+            quiet_polls += 1
+            if mode == "idle" and quiet_polls >= DRAIN_POLLS and get_practice_state(api) == 0:
+                break
+            backoff.sleep()
 
         if now - last_time > inactivity_timeout:
             break
 
-    return error_detected, "\n".join(messages)
-
-
-def run_cmm(cmm_path: str):
-    api = init_trace32()
-    if not api:
-        return "FAIL: TRACE32 connection failed."
-
+    return reader.error_detected, reader.text()
+
+
+def run_cmm(cmm_path: str, on_message=None, target=None, timeout=None, cancel=None):
+    """
+    Run a CMM script on the shared TRACE32 session of `target` (default:
+    the [runtime] node/port). With `on_message`, each TRACE32 message is
+    passed to it as soon as it is read and the result carries only the
+    verdict and timings instead of the full log. `timeout` replaces
+    [runtime] timeout for this run. Once `cancel` (an Event) is set, the
+    script is stopped with T32_Stop at the next poll.
+    """
+    s = get_settings()
+    timeout = timeout or s.timeout
+    timer = PhaseTimer()
     try:
-        attach_rc = api.T32_Attach(1)
-        ping_rc   = api.T32_Ping()
-        if attach_rc != 0 or ping_rc != 0:
-            return "FAIL: Failed to attach to TRACE32."
-
-        api.T32_Cmd(b"RESET")
-
-        ok_script = run_cmm_script(api, cmm_path)
-        if not ok_script:
-            return "FAIL: Failed to run CMM script."
-
-        done = wait_for_script_completion(api)
-        if not done:
-            return "FAIL: ⚠️ Script did not finish in time."
-
-        error, messages = collect_messages_and_detect_error(api)
-        if error:
-            return "FAIL:\n" + messages
-        else:
-            return "PASS:\n" + messages
-
-    finally:
-        api.T32_Exit()
\ No newline at end of file
+        with borrow_trace32(target, s) as api:
+            timer.mark("connect")
+            api.T32_Cmd(b"RESET")
+            timer.mark("reset")
+
+            ok_script = run_cmm_script(api, cmm_path)
+            timer.mark("start")
+            if not ok_script:
+                return "FAIL: Failed to run CMM script."
+
+            capture = LogCapture(s.tmp_dir, os.path.basename(cmm_path), s.log_tail_lines, s.log_keep)
+            reader = MessageReader(api, on_message, keep=on_message is None,
+                                   rules=load_rules(s), capture=capture, cancel=cancel)
+            try:
+                done = wait_for_script_completion(api, timeout, reader)
+                timer.mark("wait")
+                if not done:
+                    api.T32_Stop()   # the next job on this target must not find it still running
+                    return "FAIL: ⚠️ Script did not finish in time.\n" + timer.summary()
+
+                if not reader.cancelled:
+                    error, messages = collect_messages_and_detect_error(
+                        api, timeout, s.inactivity_timeout, s.completion_mode, reader
+                    )
+                if reader.fatal or reader.cancelled or reader.timed_out:
+                    api.T32_Stop()   # fatal rule, CANCEL or timeout: don't let the script run on
+                timer.mark("collect")
+                if reader.cancelled:
+                    return "FAIL: Cancelled, script stopped.\n" + timer.summary()
+            finally:
+                reader.close()
+            verdict = "FAIL" if error else "PASS"
+            parts = (messages, reader.verdict.summary(), timer.summary())
+            body = "\n".join(part for part in parts if part)
+            return f"{verdict}:\n{body}"
+
+    except ConnectionError as e:
+        return f"FAIL: TRACE32 connection failed. {e}"
+
+
+def stop_script(target=None):
+    """T32_Stop on `target`: ends a script a killed worker left running there."""
+    try:
+        with borrow_trace32(target) as api:
+            api.T32_Stop()
+    except ConnectionError as e:
+        return f"FAIL: TRACE32 connection failed. {e}"
+    return "PASS: Script stopped"
@@ -0,0 +1,198 @@
+# session.py
+# This module keeps TRACE32 API connections alive between tool runs.
+# The DLL is loaded once per path and every node/port gets one session that
+# is health-checked with T32_Ping and transparently reconnected when it drops.
+# Sessions sharing the DLL each own an API channel (T32_SetChannel), so
+# several TRACE32 instances can be driven from one process.
+import ctypes
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import count, observe
+
+INIT_RETRIES  = 20
+RETRY_DELAY   = 0.25
+
+_loader = ctypes.cdll.LoadLibrary
+_libraries = {}
+_pools = {}
+_lock = threading.Lock()
+_api_lock = threading.RLock()   # the DLL keeps the selected channel globally
+
+
+def set_loader(loader):
+    """
+    Replace the function used to load the TRACE32 API library
+    (e.g. with a fake implementation for offline runs).
+    Already loaded libraries are dropped.
+    """
+    global _loader
+    with _lock:
+        _loader = loader
+        _libraries.clear()
+
+
+def load_library(dll_path):
+    with _lock:
+        api = _libraries.get(dll_path)
+        if api is None:
+            start = time.monotonic()
+            api = _loader(dll_path)
+            observe("t32_session_seconds", time.monotonic() - start, step="dll_load")
+            _libraries[dll_path] = api
+        return api
+
+
+class ChannelApi:
+    """
+    Wraps the library so every call first selects this session's channel.
+    Selecting and calling happen under one process-wide lock.
+    """
+
+    def __init__(self, lib, channel):
+        self._lib = lib
+        self._channel = channel
+
+    def __getattr__(self, name):
+        func = getattr(self._lib, name)
+        lib, channel = self._lib, self._channel
+
+        def call(*args):
+            with _api_lock:
+                lib.T32_SetChannel(channel)
+                return func(*args)
+
+        setattr(self, name, call)
+        return call
+
+
+def open_channel(lib):
+    # Libraries without channel support drive a single connection directly
+    if not hasattr(lib, "T32_GetChannelSize"):
+        return lib
+    with _api_lock:
+        channel = ctypes.create_string_buffer(lib.T32_GetChannelSize())
+        lib.T32_GetChannelDefaults(channel)
+    return ChannelApi(lib, channel)
+
+
+class T32Session:
+    def __init__(self, dll_path, node, port, packlen):
+        self.dll_path = dll_path
+        self.node     = str(node)
+        self.port     = str(port)
+        self.packlen  = str(packlen)
+        self.api      = None
+        self.channel  = None
+        self.lock     = threading.RLock()
+        self.connects = 0
+
+    def __repr__(self):
+        return f"T32Session({self.node}:{self.port})"
+
+    def try_connect(self):
+        """One T32_Init/T32_Attach/T32_Ping attempt; the API handle, or None if TRACE32 did not answer."""
+        if self.channel is None:
+            self.channel = open_channel(load_library(self.dll_path))
+        api = self.channel
+        start = time.monotonic()
+        if (
+            api.T32_Config(b"NODE=", self.node.encode()) == 0 and
+            api.T32_Config(b"PORT=", self.port.encode()) == 0 and
+            api.T32_Config(b"PACKLEN=", self.packlen.encode()) == 0 and
+            api.T32_Init() == 0
+        ):
+            attached = time.monotonic()
+            observe("t32_session_seconds", attached - start, step="init")
+            if api.T32_Attach(1) == 0 and api.T32_Ping() == 0:
+                observe("t32_session_seconds", time.monotonic() - attached, step="attach")
+                self.api = api
+                self.connects += 1
+                return api
+            api.T32_Exit()
+        return None
+
+    def connect(self):
+        for attempt in range(INIT_RETRIES):
+            if attempt:
+                count("t32_session_retries_total")
+                time.sleep(RETRY_DELAY)
+            api = self.try_connect()
+            if api is not None:
+                return api
+        raise ConnectionError(f"TRACE32 connection failed ({self.node}:{self.port})")
+
+    def is_healthy(self):
+        if self.api is None:
+            return False
+        try:
+            return self.api.T32_Ping() == 0
+        except OSError:
+            return False
+
+    def ensure_connected(self):
+        if self.is_healthy():
+            return self.api
+        if self.api is not None:
+            print(f"[TRACE32] {self} lost, reconnecting")
+            count("t32_reconnects_total")
+            self.close()
+        return self.connect()
+
+    def close(self):
+        api, self.api = self.api, None
+        self.channel = None
+        if api is not None:
+            try:
+                api.T32_Exit()
+            except OSError:
+                pass
+
+
+class SessionPool:
+    def __init__(self, dll_path):
+        self.dll_path = dll_path
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, node, port, packlen):
+        key = (str(node), str(port))
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = T32Session(self.dll_path, node, port, packlen)
+                self.sessions[key] = session
+            return session
+
+    @contextmanager
+    def borrow(self, node, port, packlen):
+        """
+        Yield a connected API handle for node/port, holding the session
+        exclusively until the block exits. A ConnectionError raised inside
+        the block drops the connection so the next borrow reconnects.
+        """
+        session = self.get(node, port, packlen)
+        with session.lock:
+            api = session.ensure_connected()
+            try:
+                yield api
+            except ConnectionError:
+                session.close()
+                raise
+
+    def close_all(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            with session.lock:
+                session.close()
+
+
+def get_pool(dll_path):
+    with _lock:
+        pool = _pools.get(dll_path)
+        if pool is None:
+            pool = SessionPool(dll_path)
+            _pools[dll_path] = pool
+        return pool
@@ -0,0 +1,48 @@
+# targets.py
+# This module describes the TRACE32 instances (targets) available on the bench.
+# Targets are listed in the [targets] section of config.ini:
+#
+#   [targets]
+#   bench1 = localhost:20000 arm flash
+#   bench2 = localhost:20001:2048 arm
+#
+# i.e. name = node:port[:packlen] followed by optional capability tags.
+# Without a [targets] section the single [runtime] trace32_node/port is used.
+from settings import get_settings
+
+
+class Target:
+    def __init__(self, name, node, port, packlen="1024", capabilities=()):
+        self.name = name
+        self.node = node
+        self.port = str(port)
+        self.packlen = str(packlen)
+        self.capabilities = set(capabilities)
+
+    def __repr__(self):
+        return f"Target({self.name}, {self.node}:{self.port})"
+
+    def same_endpoint(self, other):
+        return (self.node, self.port, self.packlen, self.capabilities) == \
+               (other.node, other.port, other.packlen, other.capabilities)
+
+    def matches(self, want):
+        """`want` is empty (any target), a target name or a capability tag."""
+        return not want or want == self.name or want in self.capabilities
+
+
+def parse_target(name, spec):
+    fields = spec.replace(",", " ").split()
+    if not fields:
+        raise ValueError(f"Target '{name}' has no endpoint")
+    endpoint = fields[0].split(":")
+    if len(endpoint) not in (2, 3) or not endpoint[1].isdigit():
+        raise ValueError(f"Target '{name}': expected node:port[:packlen], got '{fields[0]}'")
+    return Target(name, *endpoint, capabilities=fields[1:])
+
+
+def load_targets(settings=None):
+    s = settings or get_settings()
+    if s.targets:
+        return [parse_target(name, spec) for name, spec in s.targets.items()]
+    return [Target("default", s.trace32_node, s.trace32_port, s.trace32_packlen)]
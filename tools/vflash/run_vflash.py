@@ -22,4 +22,4 @@ class vFlash:
 
 def run_vflash(path_to_pack):
   
-    return "Flash completed successfully."
+    return "FAIL: vFlash not implemented"
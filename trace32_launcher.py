@@ -1,29 +1,87 @@
 # trace32_launcher.py
 # This module provides functionality to launch and manage TRACE32.
-import os, subprocess, time, ctypes, configparser
-from auto_config import  CONFIG_PATH
+# A launch is finished when the remote API answers, not after a fixed sleep:
+# wait_ready() probes the configured port with T32_Init/T32_Ping, backing off
+# from 50 ms to 1 s. Process checks use the Popen handle or one snapshot of
+# the process table instead of running tasklist.
+# With [runtime] standby_port set, the server runs Standby: a second instance
+# is kept ready and promoted when the primary dies. The server switches to
+# the standby port in memory (on_promote), trace32_port in config.ini is
+# updated afterwards and a new standby is started.
+import ctypes
+import os
+import subprocess
+import sys
+import threading
+import time
 
-cfg = configparser.ConfigParser()
-cfg.read(CONFIG_PATH)
+from app_paths import TOOLS_DIR
+from settings import get_settings, update_setting
 
-T32_EXE    = cfg.get("paths", "trace32_exe", fallback="")
-T32_CONFIG = cfg.get("paths", "trace32_config", fallback="")
-T32_DLL    = cfg.get("paths", "trace32_dll", fallback="")
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
 
-NODE         = "localhost"
-PORT         = "20000"
-PACKLEN      = "1024"
+T32_EXES       = ("t32marm.exe", "t32start.exe")
+PROBE_FIRST    = 0.05   # seconds before the second readiness probe, doubled up to PROBE_MAX
+PROBE_MAX      = 1.0
+WATCH_INTERVAL = 0.2    # seconds between liveness checks of the primary instance
+PROBE_INTERVAL = 1.0    # seconds between API probes of a primary started elsewhere (no process handle)
+PROBE_FAILURES = 3      # consecutive failed probes before such a primary counts as gone
+RETRY_MAX      = 30.0   # longest pause after a failed check, doubled from WATCH_INTERVAL
 
-import locale
 
-def is_running():
+def _norm(name):
+    # "T32MARM.EXE" (Windows) and "t32marm" (/proc/<pid>/comm, max 15 chars) compare equal
+    return os.path.splitext(os.path.basename(name).lower())[0][:15]
+
+
+if sys.platform == "win32":
+    class _ProcessEntry(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", ctypes.c_ulong), ("cntUsage", ctypes.c_ulong),
+            ("th32ProcessID", ctypes.c_ulong), ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", ctypes.c_ulong), ("cntThreads", ctypes.c_ulong),
+            ("th32ParentProcessID", ctypes.c_ulong), ("pcPriClassBase", ctypes.c_long),
+            ("dwFlags", ctypes.c_ulong), ("szExeFile", ctypes.c_wchar * 260),
+        ]
+
+    def _process_names():
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.CreateToolhelp32Snapshot.restype = ctypes.c_void_p
+        snapshot = kernel32.CreateToolhelp32Snapshot(0x2, 0)     # TH32CS_SNAPPROCESS
+        if snapshot in (None, ctypes.c_void_p(-1).value):
+            raise ctypes.WinError(ctypes.get_last_error())
+        names = set()
+        try:
+            entry = _ProcessEntry()
+            entry.dwSize = ctypes.sizeof(entry)
+            ok = kernel32.Process32FirstW(ctypes.c_void_p(snapshot), ctypes.byref(entry))
+            while ok:
+                names.add(_norm(entry.szExeFile))
+                ok = kernel32.Process32NextW(ctypes.c_void_p(snapshot), ctypes.byref(entry))
+        finally:
+            kernel32.CloseHandle(ctypes.c_void_p(snapshot))
+        return names
+else:
+    def _process_names():
+        names = set()
+        for pid in os.listdir("/proc"):
+            if pid.isdigit():
+                try:
+                    with open(f"/proc/{pid}/comm") as f:
+                        names.add(_norm(f.read().strip()))
+                except OSError:
+                    pass
+        return names
+
+
+def is_running(proc=None):
+    """True if `proc` (a Popen) is alive, or without one, if any TRACE32 process exists."""
+    if proc is not None:
+        return proc.poll() is None
     try:
-        cp = locale.getpreferredencoding(False)
-        output = subprocess.check_output(
-            "tasklist",
-            creationflags=subprocess.CREATE_NO_WINDOW
-        ).decode(cp, errors="ignore")
-        return any(name in output.lower() for name in ("t32marm.exe", "t32start.exe"))
+        wanted = {_norm(name) for name in T32_EXES + (get_settings().trace32_exe,)}
+        return bool(wanted & _process_names())
     except Exception as e:
         print(f"[TRACE32] Error checking running processes: {e}")
         return False
@@ -40,30 +98,177 @@ def kill_existing():
         except Exception as e:
             print(f"[TRACE32] Failed to kill {exe}: {e}")
 
-def launch_trace32():
-    if is_running():
-        print("[TRACE32] Already running.")
-        return None
-    kill_existing()
-    cmd = [T32_EXE, "-c", T32_CONFIG]
+
+def probe(port=None):
+    """One readiness probe: True if TRACE32 answers T32_Init/T32_Attach/T32_Ping on `port`."""
+    from trace32.session import T32Session
+
+    s = get_settings()
+    session = T32Session(s.trace32_dll, s.trace32_node, port or s.trace32_port, s.trace32_packlen)
+    try:
+        return session.try_connect() is not None
+    except OSError:
+        return False
+    finally:
+        session.close()
+
+
+def wait_ready(proc=None, port=None, timeout=None):
+    """
+    Probe the API port with backoff until TRACE32 answers; returns the
+    seconds waited. Fails early if `proc` exits.
+    """
+    s = get_settings()
+    port = str(port or s.trace32_port)
+    timeout = s.launch_timeout if timeout is None else timeout
+    start = time.monotonic()
+    delay = PROBE_FIRST
+    while True:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"TRACE32 exited with code {proc.returncode} before port {port} answered")
+        if probe(port):
+            return time.monotonic() - start
+        if time.monotonic() - start + delay > timeout:
+            raise TimeoutError(f"TRACE32 did not answer on port {port} within {timeout:g}s")
+        time.sleep(delay)
+        delay = min(delay * 2, PROBE_MAX)
+
+
+def start_instance(config=None):
+    """Start one TRACE32 process with `config` (default [paths] trace32_config) without waiting."""
+    s = get_settings()
+    cmd = [s.trace32_exe, "-c", config or s.trace32_config]
     print(f"[TRACE32] Launching: {' '.join(cmd)}")
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    time.sleep(2)
-    if p.poll() is not None:
-        out, err = p.communicate(timeout=5)
-        raise RuntimeError(f"TRACE32 exited: {err.decode(errors='ignore')}")
-    print("[TRACE32] Launched.")
+    # output goes to DEVNULL: an unread pipe would stall TRACE32 once it fills up
+    return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def launch_trace32(wait=True):
+    """
+    Start TRACE32 unless an instance already answers on the API port.
+    Returns the Popen handle (None when reusing a running instance). With
+    wait=False the caller does other work and calls wait_ready() itself.
+    """
+    if is_running():
+        if probe():
+            print("[TRACE32] Already running.")
+            return None
+        print("[TRACE32] Found an instance that does not answer, restarting it.")
+        kill_existing()
+    p = start_instance()
+    if wait:
+        print(f"[TRACE32] Ready after {wait_ready(p):.1f}s.")
     return p
 
+
 def init_api():
-    print(f"[TRACE32] Loading DLL: {T32_DLL}")
-    api = ctypes.cdll.LoadLibrary(T32_DLL)
-    api.T32_Config(b"NODE=",    NODE)
-    api.T32_Config(b"PORT=",    PORT)
-    api.T32_Config(b"PACKLEN=", PACKLEN)
-    api.T32_Init()
-    api.T32_Attach(1)
-    api.T32_Ping()
- 
-    return api
+    """Connected API handle of the pooled session for [runtime] trace32_node/port."""
+    from trace32.session import get_pool
+
+    s = get_settings()
+    print(f"[TRACE32] Loading DLL: {s.trace32_dll}")
+    return get_pool(s.trace32_dll).get(s.trace32_node, s.trace32_port, s.trace32_packlen).ensure_connected()
+
+
+class Standby:
+    """
+    Primary TRACE32 instance plus a ready standby on [runtime] standby_port,
+    started with [paths] trace32_standby_config (a config.t32 whose RCL port
+    is standby_port). When the primary exits, watch() promotes the standby:
+    on_promote(port) switches the caller to it, then its port is written to
+    trace32_port and a new standby is started in the freed slot; on_ready(port)
+    is called once a standby answers. Covers the single [runtime] endpoint,
+    not [targets].
+    """
+
+    def __init__(self, primary=None, on_promote=None, on_ready=None):
+        s = get_settings()
+        if not s.standby_port or not s.trace32_standby_config:
+            raise ValueError("standby needs [runtime] standby_port and [paths] trace32_standby_config")
+        self.configs = {s.trace32_port: s.trace32_config,
+                        str(s.standby_port): s.trace32_standby_config}
+        self.primary, self.primary_port = primary, s.trace32_port
+        self.standby, self.standby_port = None, str(s.standby_port)
+        self.promotions = 0
+        self.on_promote, self.on_ready = on_promote, on_ready
+        self.failed_probes = 0
+        self.next_probe = 0.0
+        self._stop = threading.Event()
+
+    def start_standby(self, wait=True):
+        # the freed port may still be held by the old primary (hung, or started elsewhere)
+        if probe(self.standby_port):
+            raise RuntimeError(f"port {self.standby_port} still answers; stop that TRACE32 to get a standby")
+        self.standby = start_instance(self.configs[self.standby_port])
+        if wait:
+            self.wait_standby()
+
+    def wait_standby(self):
+        waited = wait_ready(self.standby, self.standby_port)
+        print(f"[TRACE32] Standby ready on port {self.standby_port} after {waited:.1f}s.")
+        if self.on_ready:
+            self.on_ready(self.standby_port)
+
+    def primary_alive(self):
+        # a Popen handle answers at once; a primary started elsewhere (launcher.py)
+        # is probed at most every PROBE_INTERVAL and only gone after PROBE_FAILURES misses
+        if self.primary is not None:
+            return is_running(self.primary)
+        now = time.monotonic()
+        if now < self.next_probe:
+            return True
+        self.next_probe = now + PROBE_INTERVAL
+        if probe(self.primary_port):
+            self.failed_probes = 0
+            return True
+        self.failed_probes += 1
+        print(f"[TRACE32] Primary on port {self.primary_port} did not answer "
+              f"({self.failed_probes}/{PROBE_FAILURES}).")
+        return self.failed_probes < PROBE_FAILURES
+
+    def promote(self):
+        start = time.monotonic()
+        old, old_proc = self.primary_port, self.primary
+        self.primary, self.primary_port = self.standby, self.standby_port
+        self.standby, self.standby_port = None, old
+        self.failed_probes = 0
+        if self.on_promote:
+            self.on_promote(self.primary_port)
+        self.promotions += 1
+        print(f"[TRACE32] Primary on port {old} is gone, standby on port {self.primary_port} "
+              f"promoted in {(time.monotonic() - start) * 1000:.0f} ms.")
+        # persisted for restarts only; the running server does not wait for the reload
+        try:
+            update_setting("runtime", "trace32_port", self.primary_port)
+        except OSError as e:
+            print(f"[TRACE32] Could not save trace32_port={self.primary_port} to config.ini: {e}")
+        if old_proc is not None and old_proc.poll() is None:
+            old_proc.kill()         # frees its port for the next standby
+            old_proc.wait(5)
+
+    def check(self):
+        """One liveness check: promote a standby if the primary died, replace a dead standby."""
+        if not self.primary_alive():
+            if self.standby is not None and is_running(self.standby):
+                self.promote()
+            else:
+                print(f"[TRACE32] Primary on port {self.primary_port} is gone and no standby is ready.")
+                self.primary = start_instance(self.configs[self.primary_port])
+                self.failed_probes = 0
+                wait_ready(self.primary, self.primary_port)
+        if self.standby is None or not is_running(self.standby):
+            self.start_standby()
+
+    def watch(self):
+        """Check every WATCH_INTERVAL until stop(); after errors, back off up to RETRY_MAX."""
+        delay = WATCH_INTERVAL
+        while not self._stop.wait(delay):
+            try:
+                self.check()
+                delay = WATCH_INTERVAL
+            except Exception as e:
+                delay = min(max(delay * 2, 1.0), RETRY_MAX)
+                print(f"[TRACE32] Standby watch: {e} (next try in {delay:g}s)")
 
+    def stop(self):
+        self._stop.set()
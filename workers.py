@@ -0,0 +1,369 @@
+# workers.py
+# Runs tool runners in worker processes, one per target. A call into the
+# TRACE32 DLL that hangs cannot be interrupted inside a thread, but a process
+# can be killed: the server waits for each job with a deadline, and a worker
+# that overruns it (or dies) is killed and replaced while the client gets a
+# FAIL right away. Workers start ahead of time with the API library loaded
+# and their target's session connected, so a job does not pay for that.
+# A cancelled job is asked to stop through the worker's CancelFlag; one
+# that has not returned CANCEL_GRACE seconds later is killed like a hung one,
+# unless its tool cannot be stopped safely that way (not "cancellable", or
+# programming flash): those keep the target until they return.
+# Either way the client gets its FAIL as soon as the worker is killed; the
+# replacement then stops the PRACTICE script the killed one may have left
+# running, holding the worker's lock so the next job on the target waits.
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+from metrics import METRICS, count
+from registry import TOOL_REGISTRY
+
+READY_TIMEOUT = 30.0     # seconds a new worker may take to load the API
+DEADLINE_MARGIN = 30.0   # added to timeout + inactivity_timeout for the auto deadline
+FLASH_RATE_FLOOR = 16 * 1024   # bytes/s of the slowest flash (erase, program, verify) a flash job may take
+CANCEL_GRACE = 2.0       # seconds a cancelled job gets to stop before its worker is killed
+CANCEL_POLL = 0.05       # how often a running job's cancel token is checked
+HALT_TIMEOUT = 10.0      # seconds the replacement worker gets for T32_Stop
+
+_context = multiprocessing.get_context("spawn")   # same behaviour on Windows and Linux
+
+
+class CancelFlag:
+    """
+    Event-like flag shared with a worker process: a byte of shared memory
+    that the runner polls (is_set), so it needs no semaphore or pipe message.
+    """
+
+    def __init__(self):
+        self._value = _context.RawValue("b", 0)
+
+    def set(self):
+        self._value.value = 1
+
+    def clear(self):
+        self._value.value = 0
+
+    def is_set(self):
+        return bool(self._value.value)
+
+
+def job_deadline(settings, timeout=None, tool=None, path=None):
+    """
+    Seconds a single job may take before its worker is killed ([runtime]
+    job_deadline, 0: auto from `timeout`, default [runtime] timeout). With
+    both, a job gets the shorter one, so job_deadline caps adaptive and
+    RUNSUITE timeouts too. Flash tools have no timeout; their image at FLASH_RATE_FLOOR is added,
+    and a configured job_deadline never cuts them shorter than that.
+    """
+    auto = (timeout or settings.timeout) + settings.inactivity_timeout + DEADLINE_MARGIN
+    if tool and TOOL_REGISTRY.get(tool, {}).get("flash"):
+        try:
+            auto += os.path.getsize(path) / FLASH_RATE_FLOOR
+        except (OSError, TypeError):
+            pass
+        return max(settings.job_deadline, auto)
+    if settings.job_deadline > 0:
+        return min(settings.job_deadline, auto) if timeout else settings.job_deadline
+    return auto
+
+
+def _warm_up(target):
+    # load the API library and connect the target's session ahead of the first job
+    from settings import get_settings
+    from trace32.session import get_pool
+
+    s = get_settings()
+    try:
+        pool = get_pool(s.trace32_dll)
+        if target is None:
+            pool.get(s.trace32_node, s.trace32_port, s.trace32_packlen).ensure_connected()
+        else:
+            pool.get(target.node, target.port, target.packlen).ensure_connected()
+    except Exception as e:
+        # the job will retry the connection; TRACE32 may simply not be up yet
+        print(f"[WORKER] Warm-up for {target and target.name} incomplete: {e}")
+
+
+def worker_main(conn, target, initializer=None, cancel=None):
+    """
+    Worker process loop; `cancel` is the CancelFlag the server sets to stop
+    the current job. Requests and replies:
+      ("run", tool, path, streaming, timeout) -> ("msg", line)* ("result", text, metrics)
+      ("read", address, size, access) -> [("data", size) + raw bytes] ("result", ...)
+      ("write", address, size, access) + raw bytes -> ("result", ...)
+      ("halt",) -> ("result", ...)   T32_Stop, after a killed job
+    """
+    if initializer is not None:
+        func, args = initializer
+        func(*args)
+    from registry import call_runner
+    from trace32.mem_transfer import read_target, write_target
+    from trace32.run_cmm import stop_script
+
+    _warm_up(target)
+    METRICS.export()           # warm-up metrics are reported with the first job
+    conn.send(("ready", os.getpid()))
+    buffer = bytearray()       # memory transfer buffer, reused while large enough
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        kind = request[0]
+        if kind == "stop":
+            return
+        try:
+            if kind == "run":
+                _, tool, path, streaming, timeout = request
+                on_message = (lambda line: conn.send(("msg", line))) if streaming else None
+                result = call_runner(tool, path, on_message, target, timeout, cancel)
+            elif kind == "halt":
+                result = stop_script(target)
+            else:
+                _, address, size, access = request
+                if len(buffer) < size:
+                    buffer = bytearray(size)
+                if kind == "read":
+                    result = read_target(address, size, buffer, target, access)
+                    if result.startswith("PASS"):
+                        conn.send(("data", size))
+                        conn.send_bytes(buffer, 0, size)
+                else:
+                    conn.recv_bytes_into(buffer)
+                    with memoryview(buffer)[:size] as data:
+                        result = write_target(address, data, target, access)
+        except Exception as e:
+            traceback.print_exc()
+            result = f"FAIL: {e}"
+        conn.send(("result", result, METRICS.export()))
+
+
+class Worker:
+    """Server-side handle of one worker process."""
+
+    def __init__(self, target, initializer=None):
+        self.target = target
+        self.initializer = initializer
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.lock = threading.Lock()     # one job at a time
+        self.retired = False
+        self.start()
+
+    @property
+    def name(self):
+        return self.target.name if self.target else "default"
+
+    def start(self):
+        parent, child = _context.Pipe()
+        self.cancel = CancelFlag()
+        self.process = _context.Process(
+            target=worker_main, args=(child, self.target, self.initializer, self.cancel),
+            name=f"runner-{self.name}", daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.conn = parent
+        self.ready = False
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        if self.conn is not None:
+            self.conn.close()
+
+    def restart(self, reason):
+        print(f"[PYTHON] Worker {self.name} (pid {self.process.pid}) {reason}, restarting")
+        count("t32_worker_restarts_total", target=self.name)
+        self.kill()
+        self.start()
+
+    def stop(self):
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(2)
+        self.kill()
+
+    def _wait_ready(self):
+        if self.ready:
+            return
+        deadline = time.monotonic() + READY_TIMEOUT
+        while True:
+            if not self.conn.poll(max(deadline - time.monotonic(), 0)):
+                raise TimeoutError("worker did not start in time")
+            kind, *_ = self.conn.recv()
+            if kind == "ready":
+                self.ready = True
+                return
+
+    def run(self, tool, path, on_message=None, deadline=60.0, timeout=None, cancel=None):
+        """Run a job in the worker; returns the result text, or a FAIL if it overran or died."""
+        return self._call(("run", tool, path, on_message is not None, timeout), tool, deadline,
+                          on_message=on_message, cancel=cancel)
+
+    @staticmethod
+    def _killable(request):
+        # may a cancel that is not honoured in time be enforced by killing the worker?
+        if request[0] != "run":
+            return True
+        entry = TOOL_REGISTRY.get(request[1], {})
+        return entry.get("cancellable", False) and not entry.get("flash", False)
+
+    @staticmethod
+    def _on_trace32(request):
+        # a run of a tool that drives TRACE32 (a CMM script, or a flash setup script)
+        return request[0] == "run" and TOOL_REGISTRY.get(request[1], {}).get("targeted", False)
+
+    def _recover(self):
+        # runs on its own thread after the FAIL went out; _call left the lock held
+        try:
+            self._halt()
+        finally:
+            if self.retired:
+                self.stop()
+            self.lock.release()
+
+    def _halt(self):
+        # after killing a run: stop its script from the new worker
+        try:
+            self._wait_ready()
+            self.conn.send(("halt",))
+            if not self.conn.poll(HALT_TIMEOUT):
+                self.restart(f"did not stop the script within {HALT_TIMEOUT:.0f}s")
+                return
+            _, result, metrics = self.conn.recv()
+            METRICS.merge(metrics)
+            print(f"[PYTHON] Worker {self.name}: {result.splitlines()[0]}")
+        except (EOFError, OSError, TimeoutError) as e:
+            self.restart(f"failed ({e or type(e).__name__})")
+
+    def read_memory(self, address, out, access, deadline=60.0, cancel=None):
+        """Fill `out` (a bytearray of the transfer size) from target memory."""
+        return self._call(("read", address, len(out), access), "READMEM", deadline, out=out, cancel=cancel)
+
+    def write_memory(self, address, data, access, deadline=60.0, cancel=None):
+        return self._call(("write", address, len(data), access), "WRITEMEM", deadline, payload=data,
+                          cancel=cancel)
+
+    def _call(self, request, label, deadline, on_message=None, payload=None, out=None, cancel=None):
+        # `cancel` (a threading.Event) is the client's CANCEL; it is passed on
+        # to the worker's CancelFlag and, for killable jobs, bounds the job
+        # to CANCEL_GRACE
+        killable = self._killable(request)
+        halt = False
+        self.lock.acquire()
+        try:
+            if not self.process.is_alive():      # died while idle: replace it before the job
+                self.restart(f"exited with code {self.process.exitcode}")
+            self._wait_ready()
+            self.cancel.clear()
+            self.conn.send(request)
+            if payload is not None:
+                self.conn.send_bytes(payload)
+            end = time.monotonic() + deadline
+            stop_by = None
+            while True:
+                now = time.monotonic()
+                if not self.cancel.is_set() and cancel is not None and cancel.is_set():
+                    self.cancel.set()
+                    stop_by = now + CANCEL_GRACE if killable else None
+                if stop_by is not None and now >= stop_by:
+                    self.restart(f"did not stop within {CANCEL_GRACE:.0f}s of a cancel")
+                    halt = self._on_trace32(request)
+                    return f"FAIL: Cancelled, {label} on {self.name} stopped by restarting its worker"
+                remaining = end - now
+                if remaining <= 0:
+                    self.restart(f"exceeded its {deadline:.0f}s deadline")
+                    halt = self._on_trace32(request)
+                    return f"FAIL: Watchdog: {label} on {self.name} did not finish within {deadline:.0f}s"
+                if cancel is not None and not self.cancel.is_set():
+                    remaining = min(remaining, CANCEL_POLL)
+                elif stop_by is not None:
+                    remaining = min(remaining, stop_by - now)
+                if not self.conn.poll(remaining):
+                    continue
+                message = self.conn.recv()
+                if message[0] == "msg":
+                    on_message(message[1])
+                elif message[0] == "data":
+                    self.conn.recv_bytes_into(out)
+                elif message[0] == "result":
+                    METRICS.merge(message[2])
+                    return message[1]
+        except (EOFError, OSError, TimeoutError) as e:
+            self.restart(f"failed ({e or type(e).__name__})")
+            return f"FAIL: Worker for {self.name} stopped unexpectedly ({e or type(e).__name__})"
+        finally:
+            if halt:
+                threading.Thread(target=self._recover, name=f"halt-{self.name}", daemon=True).start()
+            else:
+                if self.retired:
+                    self.stop()
+                self.lock.release()
+
+
+class WorkerPool:
+    """
+    One Worker per target, started ahead of time. `initializer` is an
+    optional (function, args) pair run first in every worker (e.g. to
+    install a fake API library for offline runs).
+    """
+
+    def __init__(self, initializer=None):
+        self.initializer = initializer
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(target):
+        return None if target is None else (target.name, target.node, target.port, target.packlen)
+
+    def get(self, target):
+        key = self._key(target)
+        with self.lock:
+            worker = self.workers.get(key)
+            if worker is None:
+                worker = self.workers[key] = Worker(target, self.initializer)
+            return worker
+
+    def prestart(self, targets):
+        """Start the workers of `targets` that are not running yet."""
+        for target in targets:
+            self.get(target)
+
+    def sync(self, targets):
+        """Start workers for `targets`; retire the ones for targets that are gone. Blocks while they stop."""
+        keys = {self._key(t) for t in targets}
+        with self.lock:
+            gone = [k for k in self.workers if k not in keys]
+            retired = [self.workers.pop(k) for k in gone]
+        for worker in retired:
+            worker.retired = True
+            if worker.lock.acquire(blocking=False):    # idle: stop now, else after its job
+                try:
+                    worker.stop()
+                finally:
+                    worker.lock.release()
+        self.prestart(targets)
+
+    def run(self, target, tool, path, on_message=None, deadline=60.0, timeout=None, cancel=None):
+        return self.get(target).run(tool, path, on_message, deadline, timeout, cancel)
+
+    def read_memory(self, target, address, out, access, deadline=60.0, cancel=None):
+        return self.get(target).read_memory(address, out, access, deadline, cancel)
+
+    def write_memory(self, target, address, data, access, deadline=60.0, cancel=None):
+        return self.get(target).write_memory(address, data, access, deadline, cancel)
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = list(self.workers.values()), {}
+        for worker in workers:
+            worker.stop()